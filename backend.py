@@ -4,8 +4,8 @@ People Bingo - FastAPI Backend
 This is the original Python/FastAPI backend with WebSocket support.
 To use this backend instead of the Next.js API routes:
 
-1. Install dependencies:
-   pip install fastapi uvicorn websockets
+1. Install dependencies (Python 3.11 or newer):
+   pip install fastapi uvicorn websockets msgpack
 
 2. Run the server:
    python scripts/backend.py
@@ -17,18 +17,58 @@ To use this backend instead of the Next.js API routes:
 The backend will run on http://localhost:8000
 """
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from pydantic import BaseModel, ValidationError
+import msgpack
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+import bisect
+import gc
+import gzip
+import heapq
+import os
 import random
 import string
+import sys
+import threading
 import time
+import zlib
 from datetime import datetime
 import asyncio
 import json
+import sqlite3
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
 
-app = FastAPI()
+# asyncio.timeout, bisect's key= and friends
+if sys.version_info < (3, 11):
+    raise RuntimeError("People Bingo's backend needs Python 3.11 or newer")
+
+try:
+    import orjson
+except ImportError:  # optional fast encoder
+    orjson = None
+
+try:
+    import cbor2
+except ImportError:  # optional binary wire format
+    cbor2 = None
+
+try:
+    import brotli
+except ImportError:  # optional response compression
+    brotli = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_background_tasks()
+    try:
+        yield
+    finally:
+        await stop_background_tasks()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -39,38 +79,469 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Game storage
-games: Dict[str, dict] = {}
+# Response compression
+# Encodings in order of preference; only those the client accepts (and that are installed) apply
+COMPRESSION = [name.strip() for name in os.environ.get("BINGO_COMPRESSION", "br,gzip").split(",") if name.strip()]
+COMPRESSION_MIN_BYTES = int(os.environ.get("BINGO_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("BINGO_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BINGO_BROTLI_QUALITY", "4"))
+
+def compress_gzip(body: bytes) -> bytes:
+    # mtime=0: the same body always compresses to the same bytes
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+def compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": compress_gzip}
+if brotli:
+    COMPRESSORS["br"] = compress_brotli
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for name in COMPRESSION:
+        if name in COMPRESSORS and (name in accepted or "*" in accepted):
+            return name
+    return None
+
+class CompressionMiddleware:
+    """Compresses whole response bodies of at least COMPRESSION_MIN_BYTES.
+
+    Responses that already carry a Content-Encoding (cached_response
+    compresses once per game version) and streamed bodies pass through.
+    Every HTTP response gets its Vary: Accept-Encoding here, and only here.
+    """
+
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        
+        async def send_identity(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+            await send(message)
+        
+        if encoding is None:
+            await self.app(scope, receive, send_identity)
+            return
+        start = None
+        
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held until the body shows whether it is worth compressing
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            response_start, start = start, None
+            headers = MutableHeaders(raw=response_start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if "content-encoding" in headers or message.get("more_body") or len(body) < COMPRESSION_MIN_BYTES:
+                await send(response_start)
+                await send(message)
+                return
+            body = COMPRESSORS[encoding](body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(response_start)
+            await send({**message, "body": body})
+        
+        await self.app(scope, receive, send_compressed)
+
+app.add_middleware(CompressionMiddleware)
+
+# Counters exposed on /api/metrics
+metrics: Dict[str, float] = {
+    "sweeps": 0,
+    "games_evicted": 0,
+    "bytes_reclaimed": 0,
+    "snapshots": 0,
+    "wal_batches": 0,
+    "wal_records": 0,
+    "store_flushes": 0,
+    "store_rows_written": 0,
+    "ws_resumes": 0,
+    "ws_resume_snapshots": 0,
+    "heartbeats": 0,
+    "sockets_reaped": 0,
+}
+
+# Wire encoding
+Frame = Union[str, bytes]
+
+def encode_json(message: Any) -> str:
+    # Same compact output as WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+def encode_orjson(message: Any) -> str:
+    return orjson.dumps(message).decode()
+
+default_encoder: Callable[[Any], Frame] = encode_orjson if orjson else encode_json
+decode_json: Callable[[Union[str, bytes]], Any] = orjson.loads if orjson else json.loads
+
+# Binary encodings a socket can ask for, by ?encoding= or a "bingo.<name>" subprotocol;
+# JSON text stays the default, and commands from clients are always JSON text
+WIRE_ENCODERS: Dict[str, Callable[[Any], Frame]] = {"msgpack": msgpack.packb}
+if cbor2:
+    WIRE_ENCODERS["cbor"] = cbor2.dumps
+
+# Outbound queue policies, applied once a socket's queue reaches its high-water mark
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+
+class Outbox:
+    """Bounded send queue for one WebSocket, drained by its own writer task."""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, game_code: str,
+                 encoder: Callable[[Any], Frame]):
+        self.manager = manager
+        self.websocket = websocket
+        self.game_code = game_code
+        self.encoder = encoder
+        self.queue: deque = deque()  # (coalesce_key, frame)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task = asyncio.create_task(self.run())
+    
+    def put(self, frame: Frame, coalesce_key: Optional[str] = None) -> bool:
+        # Returns False when the policy says the consumer should be evicted
+        queue = self.queue
+        if len(queue) >= self.manager.high_water:
+            policy = self.manager.overflow_policy
+            if policy == DISCONNECT:
+                return False
+            replaced = False
+            if policy == COALESCE and coalesce_key is not None:
+                # A newer frame for the same key supersedes the queued one
+                for i, (key, _) in enumerate(queue):
+                    if key == coalesce_key:
+                        del queue[i]
+                        replaced = True
+                        break
+            if not replaced:
+                queue.popleft()
+            self.dropped += 1
+        queue.append((coalesce_key, frame))
+        self.ready.set()
+        return True
+    
+    async def run(self):
+        websocket = self.websocket
+        try:
+            while True:
+                await self.ready.wait()
+                while self.queue:
+                    _, frame = self.queue.popleft()
+                    # asyncio.timeout rather than wait_for: no extra task per send, and
+                    # a cancel racing a completed send is not swallowed
+                    async with asyncio.timeout(self.manager.send_timeout):
+                        if isinstance(frame, str):
+                            await websocket.send_text(frame)
+                        else:
+                            await websocket.send_bytes(frame)
+                self.ready.clear()
+        except (TimeoutError, OSError, RuntimeError, WebSocketDisconnect):
+            # Dead or stalled socket; anything else is a bug and should surface
+            self.manager.disconnect(websocket, self.game_code)
+            await self.manager._close(websocket, 1011)
+    
+    def close(self):
+        self.queue.clear()
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+
+class ReplayBuffer:
+    """A game's most recent sequenced frames, for sockets resuming after a drop."""
+    __slots__ = ("events", "floor")
+
+    def __init__(self, size: int, floor: int):
+        self.events: deque = deque(maxlen=size)  # (seq, message, default-encoded frame)
+        # Every event after floor is still held
+        self.floor = floor
+    
+    def append(self, seq: int, message: dict, frame: Frame):
+        if len(self.events) == self.events.maxlen:
+            self.floor = max(self.floor, self.events[0][0])
+        self.events.append((seq, message, frame))
+    
+    def since(self, seq: int) -> Optional[List[Tuple[dict, Frame]]]:
+        # None when some of the missed events have already been dropped
+        if seq < self.floor:
+            return None
+        return [(message, frame) for event_seq, message, frame in self.events if event_seq > seq]
 
 # WebSocket connections
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(
+        self,
+        send_timeout: float = 5.0,
+        encoder: Callable[[Any], Frame] = default_encoder,
+        high_water: int = 64,
+        overflow_policy: str = DROP_OLDEST,
+        replay_events: int = 256,
+        coalesce_window: float = 0.0,
+    ):
+        # game code -> {websocket: outbox}; dicts give O(1) add/remove and keep join order
+        self.active_connections: Dict[str, Dict[WebSocket, Outbox]] = {}
+        # Serializes a message once per broadcast; str frames go out as text, bytes as binary
+        self.encoder = encoder
+        # Max seconds a single send may take before the socket is treated as dead
+        self.send_timeout = send_timeout
+        # Per-socket queue bound and what to do once a slow consumer reaches it
+        if overflow_policy not in (DROP_OLDEST, COALESCE, DISCONNECT):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.high_water = high_water
+        self.overflow_policy = overflow_policy
+        self.evicted = 0
+        # game code -> recent sequenced frames, replayed to resuming sockets
+        self.replay: Dict[str, ReplayBuffer] = {}
+        self.replay_events = replay_events
+        # Seconds to hold a game's broadcasts and send them as one frame; 0 sends at once
+        self.coalesce_window = coalesce_window
+        self.pending: Dict[str, List[Tuple[Optional[str], dict]]] = {}
+        self.coalesced = 0
+        # Set in multi-worker mode: forwards broadcasts to sockets held by other processes
+        self.relay: Optional["BroadcastRelay"] = None
     
-    async def connect(self, websocket: WebSocket, game_code: str):
-        await websocket.accept()
-        if game_code not in self.active_connections:
-            self.active_connections[game_code] = []
-        self.active_connections[game_code].append(websocket)
+    async def connect(self, websocket: WebSocket, game_code: str,
+                      encoder: Optional[Callable[[Any], Frame]] = None, subprotocol: Optional[str] = None):
+        await websocket.accept(subprotocol=subprotocol)
+        connections = self.active_connections.setdefault(game_code, {})
+        connections[websocket] = Outbox(self, websocket, game_code, encoder or self.encoder)
     
     def disconnect(self, websocket: WebSocket, game_code: str):
-        if game_code in self.active_connections:
-            self.active_connections[game_code].remove(websocket)
+        # Idempotent: a socket can be dropped by its writer and then by its endpoint
+        connections = self.active_connections.get(game_code)
+        if connections is None:
+            return
+        outbox = connections.pop(websocket, None)
+        if outbox:
+            outbox.close()
+        if not connections:
+            del self.active_connections[game_code]
     
-    async def broadcast(self, game_code: str, message: dict):
-        if game_code in self.active_connections:
-            dead_connections = []
-            for connection in self.active_connections[game_code]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    dead_connections.append(connection)
-            
-            # Clean up dead connections
-            for conn in dead_connections:
-                self.active_connections[game_code].remove(conn)
+    def close_game(self, game_code: str, code: int = 1001):
+        # Drop a whole room, e.g. when its game is evicted; 1001: going away
+        self.replay.pop(game_code, None)
+        self.pending.pop(game_code, None)
+        connections = self.active_connections.pop(game_code, None)
+        if not connections:
+            return
+        for websocket, outbox in connections.items():
+            outbox.close()
+            asyncio.create_task(self._close(websocket, code))
+    
+    def _evict(self, websocket: WebSocket, game_code: str):
+        self.evicted += 1
+        self.disconnect(websocket, game_code)
+        # 1013: try again later
+        asyncio.create_task(self._close(websocket, 1013))
+    
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+    
+    async def send(self, websocket: WebSocket, game_code: str, message: dict):
+        # Direct reply to one socket, ordered with its broadcasts
+        outbox = self.active_connections.get(game_code, {}).get(websocket)
+        if outbox and not outbox.put(outbox.encoder(message)):
+            self._evict(websocket, game_code)
+    
+    def resume(self, websocket: WebSocket, game_code: str, since: int) -> bool:
+        # Queues the events a reconnecting socket missed; False if they are not all buffered
+        buffer = self.replay.get(game_code)
+        events = buffer.since(since) if buffer else None
+        if events is None:
+            return False
+        outbox = self.active_connections[game_code][websocket]
+        for message, frame in events:
+            if outbox.encoder is not self.encoder:
+                frame = outbox.encoder(message)
+            if not outbox.put(frame):
+                self._evict(websocket, game_code)
+                break
+        return True
+    
+    async def broadcast(self, game_code: str, message: dict, coalesce_key: Optional[str] = None,
+                        seq: Optional[int] = None):
+        # Only enqueues: callers never wait on other players' network I/O
+        if seq is not None:
+            message = {**message, "seq": seq}
+        if self.coalesce_window:
+            self.hold(game_code, message, coalesce_key)
+        else:
+            self.publish(game_code, message, coalesce_key)
+    
+    def publish(self, game_code: str, message: dict, coalesce_key: Optional[str] = None):
+        if self.relay:
+            self.relay.publish(game_code, message, coalesce_key)
+        self.deliver(game_code, message, coalesce_key)
+    
+    def hold(self, game_code: str, message: dict, coalesce_key: Optional[str]):
+        # The first event of a window schedules its release
+        pending = self.pending.get(game_code)
+        if pending is None:
+            pending = self.pending[game_code] = []
+            asyncio.get_running_loop().call_later(self.coalesce_window, self.release, game_code)
+        if coalesce_key is not None:
+            for i, (key, _) in enumerate(pending):
+                if key == coalesce_key:
+                    # Superseded within the window
+                    del pending[i]
+                    self.coalesced += 1
+                    break
+        pending.append((coalesce_key, message))
+    
+    def release(self, game_code: str):
+        pending = self.pending.pop(game_code, None)
+        if not pending:
+            return
+        if len(pending) == 1:
+            key, message = pending[0]
+            self.publish(game_code, message, key)
+            return
+        events = merge_events([message for _, message in pending])
+        self.coalesced += len(pending) - 1
+        if len(events) == 1:
+            self.publish(game_code, events[0])
+            return
+        batch = {"type": "batch", "events": events}
+        seqs = [event["seq"] for event in events if "seq" in event]
+        if seqs:
+            batch["seq"] = max(seqs)
+        self.publish(game_code, batch)
+    
+    def deliver(self, game_code: str, message: dict, coalesce_key: Optional[str] = None):
+        # Fan out to this process's sockets only; sequenced events are also kept for resumes
+        connections = self.active_connections.get(game_code)
+        seq = message.get("seq")
+        if not connections and seq is None:
+            return
+        # Encoded once per wire format in use, not once per socket
+        frames: Dict[Callable[[Any], Frame], Frame] = {}
+        if seq is not None:
+            buffer = self.replay.get(game_code)
+            if buffer is None:
+                buffer = self.replay[game_code] = ReplayBuffer(self.replay_events, seq - 1)
+            frame = frames[self.encoder] = self.encoder(message)
+            buffer.append(seq, message, frame)
+        if not connections:
+            return
+        for connection, outbox in list(connections.items()):
+            frame = frames.get(outbox.encoder)
+            if frame is None:
+                frame = frames[outbox.encoder] = outbox.encoder(message)
+            if not outbox.put(frame, coalesce_key):
+                self._evict(connection, game_code)
 
-manager = ConnectionManager()
+def merge_events(events: List[dict]) -> List[dict]:
+    # Runs of player_joined collapse into one players_joined carrying every name
+    merged: List[dict] = []
+    for event in events:
+        last = merged[-1] if merged else None
+        if event["type"] != "player_joined" or last is None or last["type"] not in ("player_joined", "players_joined"):
+            merged.append(event)
+            continue
+        if last["type"] == "player_joined":
+            last = merged[-1] = {"type": "players_joined", "player_names": [last["player_name"]]}
+        last["player_names"].append(event["player_name"])
+        last["player_count"] = event["player_count"]
+        if "seq" in event:
+            last["seq"] = event["seq"]
+    return merged
+
+manager = ConnectionManager(
+    send_timeout=float(os.environ.get("BINGO_WS_SEND_TIMEOUT", "5")),
+    high_water=int(os.environ.get("BINGO_WS_HIGH_WATER", "64")),
+    overflow_policy=os.environ.get("BINGO_WS_OVERFLOW_POLICY", DROP_OLDEST),
+    replay_events=int(os.environ.get("BINGO_WS_REPLAY_EVENTS", "256")),
+    coalesce_window=float(os.environ.get("BINGO_WS_COALESCE_MS", "0")) / 1000,
+)
+
+# Cross-process fan-out
+# Workers share games through the store, but each holds its own sockets; a
+# broker process passes every broadcast on to the other workers
+RELAY_SOCKET = os.environ.get("BINGO_RELAY_SOCKET")
+
+class BroadcastRelay:
+    """One worker's connection to the broker: newline-delimited JSON frames."""
+
+    def __init__(self, path: str, manager: ConnectionManager):
+        self.path = path
+        self.manager = manager
+        self.writer: Optional[asyncio.StreamWriter] = None
+    
+    def publish(self, game_code: str, message: dict, coalesce_key: Optional[str]):
+        # Buffered write; a broker outage drops remote fan-out, never the request
+        if self.writer and not self.writer.is_closing():
+            self.writer.write(encode_json([game_code, message, coalesce_key]).encode() + b"\n")
+    
+    async def run(self):
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(self.path, limit=2 ** 20)
+                while line := await reader.readline():
+                    game_code, message, coalesce_key = decode_json(line)
+                    if message.get("type") == "game_evicted":
+                        self.manager.close_game(game_code)
+                        continue
+                    self.manager.deliver(game_code, message, coalesce_key)
+                    for event in message.get("events", (message,)):
+                        if event.get("type") == "game_started" and event.get("end_time"):
+                            # Every worker arms the deadline, so the game still ends if the
+                            # one that started it goes away; end_game lets only one end it
+                            timers.schedule_at(event["end_time"], game_code)
+            except (OSError, ValueError):
+                pass
+            finally:
+                if self.writer:
+                    self.writer.close()
+                    self.writer = None
+            await asyncio.sleep(0.5)
+
+async def run_broker(path: str):
+    peers = set()
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peers.add(writer)
+        try:
+            while line := await reader.readline():
+                for peer in peers:
+                    if peer is not writer:
+                        peer.write(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            peers.discard(writer)
+            writer.close()
+    
+    server = await asyncio.start_unix_server(handle, path, limit=2 ** 20)
+    async with server:
+        await server.serve_forever()
+
+if RELAY_SOCKET:
+    manager.relay = BroadcastRelay(RELAY_SOCKET, manager)
 
 # Models
 class CreateGameRequest(BaseModel):
@@ -79,11 +550,13 @@ class CreateGameRequest(BaseModel):
 class JoinGameRequest(BaseModel):
     game_code: str
     player_name: str
+    full: bool = False
 
 class UpdateCellRequest(BaseModel):
     game_code: str
     index: int
     value: str
+    full: bool = False
 
 class UpdatePlayerCellRequest(BaseModel):
     game_code: str
@@ -91,261 +564,1711 @@ class UpdatePlayerCellRequest(BaseModel):
     cell_index: int
     name_value: str
 
+class PlayerCellEdit(BaseModel):
+    cell_index: int
+    name_value: str
+
+class UpdatePlayerCellsRequest(BaseModel):
+    game_code: str
+    player_name: str
+    edits: List[PlayerCellEdit]
+
 class StartGameRequest(BaseModel):
     game_code: str
+    full: bool = False
 
 class FinishGameRequest(BaseModel):
     game_code: str
     player_name: str
 
+# Game-code sharding
+# With --shards N each code belongs to one shard process and the front
+# dispatcher routes its requests there, so a game never leaves its owner
+SHARD_INDEX = int(os.environ.get("BINGO_SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.environ.get("BINGO_SHARD_COUNT", "1"))
+
+def shard_for(code: str, count: int = SHARD_COUNT) -> int:
+    return zlib.crc32(code.upper().encode()) % count
+
+def owns_code(code: str) -> bool:
+    return SHARD_COUNT == 1 or shard_for(code) == SHARD_INDEX
+
 # Helper functions
 def generate_game_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-
-def get_default_cells():
-    return [
-        "Has run a marathon", "Can name 3 AI models", "Speaks 3+ languages",
-        "Has been skydiving", "Plays a musical instrument", "Has visited 10+ countries",
-        "Can solve a Rubik's cube", "Has a pet", "Loves spicy food",
-        "Morning person", "Has broken a bone", "Can cook 5+ dishes",
-        "FREE SPACE", "Loves horror movies", "Has met a celebrity",
-        "Night owl", "Can do a handstand", "Has lived abroad",
-        "Knows how to code", "Loves karaoke", "Has run a business",
-        "Vegetarian/Vegan", "Can name all continents", "Has a hidden talent",
-        "Loves ice cream"
-    ]
+    # A shard draws until the code hashes to itself; SHARD_COUNT tries on average
+    while True:
+        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        if owns_code(code):
+            return code
+
+# One shared, immutable board; a game copies it only on its first update_cell
+DEFAULT_CELLS = (
+    "Has run a marathon", "Can name 3 AI models", "Speaks 3+ languages",
+    "Has been skydiving", "Plays a musical instrument", "Has visited 10+ countries",
+    "Can solve a Rubik's cube", "Has a pet", "Loves spicy food",
+    "Morning person", "Has broken a bone", "Can cook 5+ dishes",
+    "FREE SPACE", "Loves horror movies", "Has met a celebrity",
+    "Night owl", "Can do a handstand", "Has lived abroad",
+    "Knows how to code", "Loves karaoke", "Has run a business",
+    "Vegetarian/Vegan", "Can name all continents", "Has a hidden talent",
+    "Loves ice cream"
+)
+
+# Game model
+# __slots__ classes rather than dicts: tens of thousands of live players add up.
+# to_dict() is the API serialization layer.
+class Player:
+    __slots__ = ("name", "grid", "filled", "completed", "finish_time", "joined_at")
+    
+    def __init__(self, name: str, joined_at: float):
+        self.name = name
+        self.grid: List[str] = [""] * 25
+        self.filled = 0
+        self.completed = False
+        self.finish_time: Optional[float] = None
+        self.joined_at = joined_at
+    
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "grid": self.grid,
+            "filled": self.filled,
+            "completed": self.completed,
+            "finish_time": self.finish_time,
+            "joined_at": self.joined_at
+        }
+    
+    def snapshot(self) -> tuple:
+        # Compact positional form for snapshot files
+        return (self.name, self.grid, self.filled, self.completed, self.finish_time, self.joined_at)
+
+class Game:
+    __slots__ = (
+        "code", "cells", "players", "started", "duration", "start_time", "end_time",
+        "ended", "finished", "created_at", "updated_at", "version", "insights", "view_cache",
+        "snapshot_row",
+    )
+    
+    def __init__(self, code: str, duration: int, created_at: float):
+        self.code = code
+        # Copy-on-write: DEFAULT_CELLS until update_cell edits the board
+        self.cells: Sequence[str] = DEFAULT_CELLS
+        self.players: Dict[str, Player] = {}
+        self.started = False
+        self.duration = duration
+        self.start_time: Optional[float] = None
+        # Set when the game starts: start_time + duration minutes
+        self.end_time: Optional[float] = None
+        self.ended = False
+        self.finished: List[dict] = []
+        self.created_at = created_at
+        self.updated_at = created_at
+        self.version = 0
+        # Derived state, never serialized
+        self.insights = InsightsIndex()
+        # view name -> (version, serialized body, etag, compressed bodies by encoding)
+        self.view_cache: Dict[str, Tuple[int, bytes, str, Dict[str, bytes]]] = {}
+        # (version, encoded snapshot row), so unchanged games aren't re-encoded
+        self.snapshot_row: Optional[Tuple[int, bytes]] = None
+    
+    def to_dict(self) -> dict:
+        return {
+            "code": self.code,
+            "cells": self.cells,
+            "players": {name: player.to_dict() for name, player in self.players.items()},
+            "started": self.started,
+            "duration": self.duration,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "ended": self.ended,
+            "finished": self.finished,
+            "created_at": self.created_at,
+            "version": self.version
+        }
+    
+    def snapshot(self) -> tuple:
+        # Compact positional form for snapshot files; includes bookkeeping the API doesn't show
+        return (
+            self.code,
+            None if self.cells is DEFAULT_CELLS else self.cells,
+            self.started, self.duration, self.start_time, self.end_time, self.ended,
+            self.finished, self.created_at, self.updated_at, self.version,
+            [player.snapshot() for player in self.players.values()],
+            # Derived, but saving it spares restore a replay of every grid
+            self.insights.counts, self.insights.totals,
+        )
+    
+    @classmethod
+    def restore(cls, row: Sequence) -> "Game":
+        (code, cells, started, duration, start_time, end_time, ended,
+         finished, created_at, updated_at, version, players, counts, totals) = row
+        game = cls(code, duration, created_at)
+        if cells is not None:
+            game.cells = cells
+        game.started = started
+        game.start_time = start_time
+        game.end_time = end_time
+        game.ended = ended
+        game.finished = finished
+        game.updated_at = updated_at
+        game.version = version
+        game.insights.counts = counts
+        game.insights.totals = totals
+        for name, grid, filled, completed, finish_time, joined_at in players:
+            player = Player(name, joined_at)
+            player.grid = grid
+            player.filled = filled
+            player.completed = completed
+            player.finish_time = finish_time
+            game.players[name] = player
+        return game
+
+# Player grids
+FILLABLE_CELLS = 24  # every cell but FREE SPACE
+
+def write_player_cell(game: Game, player: Player, index: int, value: str):
+    # Single write path for grids: keeps the filled count and insights in step
+    old = player.grid[index]
+    if index != 12:
+        player.filled += bool(value.strip()) - bool(old.strip())
+    game.insights.replace(index, old, value)
+    player.grid[index] = value
+
+# Insights
+class InsightsIndex:
+    """Per-cell name counts, kept current as players write their grids."""
+    __slots__ = ("counts", "totals")
+
+    def __init__(self):
+        # Allocated on the first write, so games that never start stay small
+        self.counts: List[Dict[str, int]] = []
+        self.totals: List[int] = []
+    
+    def replace(self, index: int, old: str, new: str):
+        # Called with a cell's previous and new value on every write
+        if not self.counts:
+            self.counts = [{} for _ in range(25)]
+            self.totals = [0] * 25
+        counts = self.counts[index]
+        if old.strip():
+            remaining = counts[old] - 1
+            if remaining:
+                counts[old] = remaining
+            else:
+                del counts[old]
+            self.totals[index] -= 1
+        if new.strip():
+            counts[new] = counts.get(new, 0) + 1
+            self.totals[index] += 1
+    
+    def insights(self, cells: Sequence[str]) -> List[dict]:
+        counts = self.counts or [{} for _ in range(25)]
+        totals = self.totals or [0] * 25
+        return [
+            {
+                "index": idx,
+                "cell": cell,
+                "total_entries": totals[idx],
+                "unique_entries": len(counts[idx]),
+                "name_counts": counts[idx]
+            }
+            for idx, cell in enumerate(cells)
+            if idx != 12  # Skip FREE SPACE
+        ]
+
+def rescan_insights(game: Game) -> List[dict]:
+    # Full O(players x cells) rebuild; the reference the incremental index must match
+    insights = []
+    
+    for idx, cell in enumerate(game.cells):
+        if idx == 12:  # Skip FREE SPACE
+            continue
+        
+        entries = []
+        for player in game.players.values():
+            name = player.grid[idx]
+            if name.strip():
+                entries.append(name)
+        
+        # Count occurrences
+        counts = {}
+        for name in entries:
+            counts[name] = counts.get(name, 0) + 1
+        
+        insights.append({
+            "index": idx,
+            "cell": cell,
+            "total_entries": len(entries),
+            "unique_entries": len(counts),
+            "name_counts": counts
+        })
+    
+    return insights
+
+def check_insights(game_code: str) -> List[int]:
+    # Consistency check: cell indexes where the incremental index disagrees with a rescan
+    game = games[game_code]
+    expected = rescan_insights(game)
+    actual = game.insights.insights(game.cells)
+    return [e["index"] for e, a in zip(expected, actual) if e != a]
+
+# Leaderboard
+def elapsed_key(entry: dict) -> float:
+    return entry["elapsed"]
+
+def insert_finisher(finished: List[dict], entry: dict) -> int:
+    # Binary search for the slot, so the returned 1-based rank is the real sorted rank.
+    # Ties go after earlier finishers with the same elapsed time.
+    index = bisect.bisect_right(finished, entry["elapsed"], key=elapsed_key)
+    finished.insert(index, entry)
+    return index + 1
+
+# Game storage
+class MemoryGameStore(dict):
+    """Storage interface used by the routes: a code -> Game mapping plus hooks.
+
+    This base keeps games in process memory only. Persistent backends
+    override the hooks; the mapping itself stays the hot, in-memory view
+    of live games.
+    """
+
+    # True when other processes write the same games
+    shared = False
+
+    @contextmanager
+    def transaction(self):
+        # Scope of one read-validate-mutate step; shared backends lock and commit here
+        yield
+    
+    def touch(self, game: Game):
+        # Called after every mutation of a stored game
+        pass
+    
+    def evict(self, code: str):
+        # Called by the sweeper, inside transaction(), for an expired game
+        del self[code]
+    
+    def load(self):
+        # Pull live games back in at startup
+        pass
+    
+    async def flush(self):
+        pass
+    
+    async def flush_forever(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    async def history(self, limit: int, offset: int) -> List[dict]:
+        ordered = sorted(self.values(), key=lambda game: game.created_at, reverse=True)
+        return [game_summary(game) for game in ordered[offset:offset + limit]]
+
+def game_summary(game: Game) -> dict:
+    return {
+        "code": game.code,
+        "created_at": game.created_at,
+        "updated_at": game.updated_at,
+        "started": game.started,
+        "ended": game.ended,
+        "player_count": len(game.players)
+    }
+
+class SQLiteGameStore(MemoryGameStore):
+    """Write-behind SQLite persistence.
+
+    Mutated games are collected in a dirty set and written in one
+    transaction per flush interval from a worker thread. Rows outlive
+    eviction from memory, so finished games stay queryable as history.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS games (
+            code TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            started INTEGER NOT NULL,
+            ended INTEGER NOT NULL,
+            player_count INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            evicted INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS games_updated_at ON games (updated_at);
+        CREATE INDEX IF NOT EXISTS games_created_at ON games (created_at);
+    """
+    # Fixed SQL text, so sqlite3's statement cache reuses the prepared statements
+    UPSERT = "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)"
+    SELECT_LIVE = "SELECT data FROM games WHERE ended = 0 AND evicted = 0 AND updated_at > ?"
+    SELECT_HISTORY = (
+        "SELECT code, created_at, updated_at, started, ended, player_count "
+        "FROM games ORDER BY created_at DESC LIMIT ? OFFSET ?"
+    )
+
+    def __init__(self, path: str, flush_interval: float):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.dirty: Dict[str, Game] = {}
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        # One writer thread at a time
+        self.db_lock = threading.Lock()
+    
+    def __setitem__(self, code: str, game: Game):
+        super().__setitem__(code, game)
+        self.dirty[code] = game
+    
+    def touch(self, game: Game):
+        # Holds the game itself, so a game evicted before its flush still gets written
+        self.dirty[game.code] = game
+    
+    def load(self):
+        cutoff = time.time() - GAME_IDLE_TTL
+        with self.db_lock, paused_gc():
+            for (data,) in self.db.execute(self.SELECT_LIVE, (cutoff,)):
+                game = Game.restore(decode_json(data))
+                # Shards share one database file but only load their own games
+                if owns_code(game.code):
+                    super().__setitem__(game.code, game)
+    
+    def _write(self, rows: List[tuple]):
+        with self.db_lock:
+            self.db.execute("BEGIN")
+            try:
+                self.db.executemany(self.UPSERT, rows)
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+    
+    async def flush(self):
+        if not self.dirty:
+            return
+        # Encode on the loop for a consistent view; the write goes to a thread
+        rows = [self.row(game) for game in self.dirty.values()]
+        self.dirty.clear()
+        start = time.perf_counter()
+        await asyncio.to_thread(self._write, rows)
+        metrics["store_flushes"] += 1
+        metrics["store_rows_written"] += len(rows)
+        metrics["store_flush_ms"] = (time.perf_counter() - start) * 1000
+    
+    async def flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    @staticmethod
+    def row(game: Game) -> tuple:
+        return (game.code, game.created_at, game.updated_at, game.started, game.ended,
+                len(game.players), default_encoder(game.snapshot()), game.version)
+    
+    def close(self):
+        with self.db_lock:
+            self.db.close()
+    
+    def _history(self, limit: int, offset: int) -> List[dict]:
+        with self.db_lock:
+            rows = self.db.execute(self.SELECT_HISTORY, (limit, offset)).fetchall()
+        return [
+            {
+                "code": code,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "started": bool(started),
+                "ended": bool(ended),
+                "player_count": player_count
+            }
+            for code, created_at, updated_at, started, ended, player_count in rows
+        ]
+    
+    async def history(self, limit: int, offset: int) -> List[dict]:
+        return await asyncio.to_thread(self._history, limit, offset)
+
+class SharedSQLiteGameStore(SQLiteGameStore):
+    """SQLite as the source of truth for several worker processes.
+
+    The mapping becomes a per-process cache: lookups compare the cached
+    version with the row's and reload on mismatch. Mutations run inside
+    transaction(), which takes SQLite's write lock (BEGIN IMMEDIATE) so the
+    read-validate-mutate step is serialized across workers, and commit the
+    touched rows synchronously before the route responds.
+    """
+
+    shared = True
+    # Evicted rows stay on as history, but no worker may load them back
+    SELECT_VERSION = "SELECT version FROM games WHERE code = ? AND evicted = 0"
+    SELECT_DATA = "SELECT data FROM games WHERE code = ?"
+    EVICT = "UPDATE games SET evicted = 1 WHERE code = ?"
+
+    def __init__(self, path: str, flush_interval: float):
+        super().__init__(path, flush_interval)
+        self.in_transaction = False
+    
+    def refresh(self, code: str) -> Optional[Game]:
+        row = self.db.execute(self.SELECT_VERSION, (code,)).fetchone()
+        if row is None:
+            dict.pop(self, code, None)
+            return None
+        game = dict.get(self, code)
+        if game is None or game.version != row[0]:
+            (data,) = self.db.execute(self.SELECT_DATA, (code,)).fetchone()
+            game = Game.restore(decode_json(data))
+            dict.__setitem__(self, code, game)
+        return game
+    
+    def __contains__(self, code: object) -> bool:
+        return isinstance(code, str) and self.refresh(code) is not None
+    
+    def __getitem__(self, code: str) -> Game:
+        game = self.refresh(code)
+        if game is None:
+            raise KeyError(code)
+        return game
+    
+    def get(self, code: str, default: Any = None) -> Any:
+        game = self.refresh(code)
+        return default if game is None else game
+    
+    def touch(self, game: Game):
+        super().touch(game)
+        if not self.in_transaction:
+            with self.transaction():
+                pass
+    
+    def evict(self, code: str):
+        self.db.execute(self.EVICT, (code,))
+        dict.pop(self, code, None)
+    
+    @contextmanager
+    def transaction(self):
+        if self.in_transaction:
+            yield
+            return
+        # Blocks the loop while another worker holds the lock; transactions are
+        # a single lookup and mutation, so waits stay short
+        with self.db_lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.in_transaction = True
+            try:
+                yield
+                if self.dirty:
+                    self.db.executemany(self.UPSERT, [self.row(game) for game in self.dirty.values()])
+                    metrics["store_rows_written"] += len(self.dirty)
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                # Drop cached copies that may hold uncommitted changes
+                for code in self.dirty:
+                    dict.pop(self, code, None)
+                raise
+            else:
+                self.db.execute("COMMIT")
+            finally:
+                self.dirty.clear()
+                self.in_transaction = False
+    
+    async def flush_forever(self):
+        # Nothing is written behind; transactions commit as they go
+        pass
+
+STORE_BACKEND = os.environ.get("BINGO_STORE", "memory")
+SQLITE_PATH = os.environ.get("BINGO_SQLITE_PATH", "people_bingo.sqlite3")
+SQLITE_FLUSH_INTERVAL = float(os.environ.get("BINGO_SQLITE_FLUSH_MS", "50")) / 1000
+
+def create_store(backend: str = STORE_BACKEND) -> MemoryGameStore:
+    if backend == "memory":
+        return MemoryGameStore()
+    if backend == "sqlite":
+        return SQLiteGameStore(SQLITE_PATH, SQLITE_FLUSH_INTERVAL)
+    if backend == "shared-sqlite":
+        return SharedSQLiteGameStore(SQLITE_PATH, SQLITE_FLUSH_INTERVAL)
+    raise ValueError(f"Unknown store backend: {backend}")
+
+games: MemoryGameStore = create_store()
+
+# Versioned response caching
+def bump_version(game: Game):
+    # Every mutating route calls this; cached views of older versions go stale
+    game.version += 1
+    game.updated_at = time.time()
+    games.touch(game)
+
+def cached_response(request: Request, game: Game, view: str, build: Callable[[], Any]) -> Response:
+    cached = game.view_cache.get(view)
+    if cached is None or cached[0] != game.version:
+        # created_at keeps etags distinct if a code is ever reused
+        etag = f'"{view}-{int(game.created_at * 1000):x}-{game.version}"'
+        # Compressed variants are filled in on first request, once per version
+        cached = (game.version, default_encoder(build()).encode(), etag, {})
+        game.view_cache[view] = cached
+    _, body, etag, compressed = cached
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) if len(body) >= COMPRESSION_MIN_BYTES else None
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if encoding:
+        # Each representation gets its own validator
+        headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+        headers["Content-Encoding"] = encoding
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if headers["ETag"] in tags or "*" in tags:
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+    if encoding:
+        if encoding not in compressed:
+            compressed[encoding] = COMPRESSORS[encoding](body)
+        body = compressed[encoding]
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def acknowledge(game: Game, full: bool, **fields) -> dict:
+    # Mutation replies carry what changed plus the new version; the whole game,
+    # which grows with every player's grid, only when asked for
+    fields["version"] = game.version
+    if full:
+        fields["game"] = game.to_dict()
+    return fields
+
+# Mutations
+# Routes validate, then call these; WAL replay calls them with the logged arguments
+def apply_create(code: str, duration: int, created_at: float) -> Game:
+    game = games[code] = Game(code, duration, created_at)
+    return game
+
+def apply_join(game: Game, name: str, joined_at: float) -> Player:
+    player = game.players[name] = Player(name, joined_at)
+    bump_version(game)
+    return player
+
+def apply_update_cell(game: Game, index: int, value: str):
+    if game.cells is DEFAULT_CELLS:
+        game.cells = list(DEFAULT_CELLS)
+    game.cells[index] = value
+    bump_version(game)
+
+def apply_start(game: Game, start_time: float):
+    game.started = True
+    game.start_time = start_time
+    if game.duration > 0:
+        game.end_time = start_time + game.duration * 60
+    bump_version(game)
+
+def apply_end(game: Game):
+    game.ended = True
+    bump_version(game)
+
+def apply_update_player_cell(game: Game, player: Player, index: int, value: str):
+    write_player_cell(game, player, index, value)
+    bump_version(game)
+
+def apply_update_player_cells(game: Game, player: Player, edits: Sequence[Tuple[int, str]]):
+    # In order, so a later edit to the same cell wins; one version bump for the batch
+    for index, value in edits:
+        write_player_cell(game, player, index, value)
+    bump_version(game)
+
+def apply_finish(game: Game, player: Player, finish_time: float) -> int:
+    player.completed = True
+    player.finish_time = finish_time
+    # Keep the finished list sorted by elapsed time; rank is the insertion point
+    position = insert_finisher(game.finished, {
+        "name": player.name,
+        "time": finish_time,
+        "elapsed": finish_time - game.start_time
+    })
+    bump_version(game)
+    return position
+
+# Background tasks
+GAME_IDLE_TTL = float(os.environ.get("BINGO_GAME_IDLE_TTL", str(4 * 3600)))
+GAME_FINISHED_TTL = float(os.environ.get("BINGO_GAME_FINISHED_TTL", str(30 * 60)))
+SWEEP_INTERVAL = float(os.environ.get("BINGO_SWEEP_INTERVAL", "60"))
+# Seconds between protocol-level pings (0 leaves them to uvicorn), and how many
+# a socket may leave without a pong before it is closed
+WS_HEARTBEAT_INTERVAL = float(os.environ.get("BINGO_WS_HEARTBEAT_INTERVAL", "20"))
+WS_HEARTBEAT_MISSES = int(os.environ.get("BINGO_WS_HEARTBEAT_MISSES", "3"))
+
+background_tasks: List[asyncio.Task] = []
+
+def start_background_tasks():
+    recover()
+    background_tasks.append(asyncio.create_task(games.flush_forever()))
+    if SNAPSHOT_PATH:
+        background_tasks.append(asyncio.create_task(snapshot_forever()))
+    background_tasks.append(asyncio.create_task(sweep_games_forever()))
+    background_tasks.append(asyncio.create_task(timers.run()))
+    if WS_HEARTBEAT_INTERVAL > 0 and WebSocketProtocol:
+        background_tasks.append(asyncio.create_task(heartbeat_forever()))
+    if manager.relay:
+        background_tasks.append(asyncio.create_task(manager.relay.run()))
+
+async def stop_background_tasks():
+    global wal
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    if wal:
+        await wal.close()
+    if SNAPSHOT_PATH:
+        await save_snapshot(SNAPSHOT_PATH)
+    wal = None
+    await games.flush()
+
+def estimate_game_bytes(game: Game) -> int:
+    # Rough deep size; the shared DEFAULT_CELLS board belongs to no game
+    size = sys.getsizeof(game) + sys.getsizeof(game.players) + sys.getsizeof(game.finished)
+    if game.cells is not DEFAULT_CELLS:
+        size += sys.getsizeof(game.cells) + sum(sys.getsizeof(cell) for cell in game.cells)
+    for name, player in game.players.items():
+        size += sys.getsizeof(name) + sys.getsizeof(player) + sys.getsizeof(player.grid)
+        size += sum(sys.getsizeof(cell) for cell in player.grid if cell)
+    for entry in game.finished:
+        size += sys.getsizeof(entry)
+    for counts in game.insights.counts:
+        size += sys.getsizeof(counts)
+    for _, body, _, compressed in game.view_cache.values():
+        size += sys.getsizeof(body) + sum(sys.getsizeof(data) for data in compressed.values())
+    if game.snapshot_row:
+        size += sys.getsizeof(game.snapshot_row[1])
+    return size
+
+def game_expired(game: Game, now: float) -> bool:
+    idle = now - game.updated_at
+    # Finished: time is up, or every player has submitted a complete card
+    if game.ended or (game.started and len(game.finished) == len(game.players)):
+        return idle > GAME_FINISHED_TTL
+    return idle > GAME_IDLE_TTL
+
+def sweep_games(now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    evicted = 0
+    for code in [code for code, game in games.items() if game_expired(game, now)]:
+        with games.transaction():
+            # Shared stores: the cached copy can be stale, so check the current state
+            game = games.get(code)
+            if game is None or not game_expired(game, now):
+                continue
+            metrics["bytes_reclaimed"] += estimate_game_bytes(game)
+            games.evict(code)
+        evicted += 1
+        manager.close_game(code)
+        if manager.relay:
+            # Rooms on the other workers go too
+            manager.relay.publish(code, {"type": "game_evicted"}, None)
+    # Replay buffers for games this process doesn't hold: a broadcast that raced
+    # the sweep, or events relayed from another worker for a game never loaded here
+    for code in [code for code in manager.replay if code not in games]:
+        manager.close_game(code)
+    metrics["sweeps"] += 1
+    metrics["games_evicted"] += evicted
+    return evicted
+
+async def sweep_games_forever():
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        sweep_games()
+
+async def heartbeat_forever():
+    # One timer pings every socket, rather than uvicorn's keepalive task per connection
+    while True:
+        await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+        metrics["heartbeats"] += 1
+        metrics["sockets_reaped"] += await BingoWebSocketProtocol.ping_all(WS_HEARTBEAT_MISSES)
+
+class GameTimers:
+    """Heap of game deadlines served by one task that sleeps until the earliest."""
+
+    def __init__(self):
+        self.heap: List[Tuple[float, str]] = []
+        self.wakeup = asyncio.Event()
+    
+    def schedule(self, game: Game):
+        self.schedule_at(game.end_time, game.code)
+    
+    def schedule_at(self, deadline: float, code: str):
+        heapq.heappush(self.heap, (deadline, code))
+        if self.heap[0] == (deadline, code):
+            # New earliest deadline: re-arm the sleeping task
+            self.wakeup.set()
+    
+    async def run(self):
+        heap = self.heap
+        # Bind the event to the running loop
+        self.wakeup = asyncio.Event()
+        while True:
+            self.wakeup.clear()
+            if not heap:
+                await self.wakeup.wait()
+                continue
+            delay = heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    async with asyncio.timeout(delay):
+                        await self.wakeup.wait()
+                except TimeoutError:
+                    pass
+                continue
+            deadline, code = heapq.heappop(heap)
+            game = games.get(code)
+            # Skip entries for evicted games or codes that were reused
+            if game and game.end_time == deadline and not game.ended:
+                await end_game(code)
+
+timers = GameTimers()
+
+# Snapshots: gzip-compressed JSON, a header line then one row per game (see Game.snapshot),
+# written periodically and on shutdown. With snapshots on, each game keeps its last
+# encoded row so only changed games are re-encoded; that costs about the uncompressed
+# file size in memory (counted by estimate_game_bytes).
+SNAPSHOT_PATH = os.environ.get("BINGO_SNAPSHOT_PATH", "")
+SNAPSHOT_INTERVAL = float(os.environ.get("BINGO_SNAPSHOT_INTERVAL", "30"))
+SNAPSHOT_FORMAT = 1
+
+# Serializes writer threads so an older snapshot can never replace a newer one
+snapshot_write_lock = threading.Lock()
+
+@contextmanager
+def paused_gc():
+    # Building or loading millions of short-lived containers otherwise sets off
+    # repeated full collections over the whole game store
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def snapshot_rows() -> List[bytes]:
+    # Runs on the event loop so the snapshot is a consistent point in time,
+    # covering exactly the WAL records up to wal_lsn. Only games that changed
+    # since the last snapshot are encoded; the rest reuse their cached row.
+    rows = []
+    with paused_gc():
+        for game in games.values():
+            cached = game.snapshot_row
+            if cached is None or cached[0] != game.version:
+                cached = game.snapshot_row = (game.version, default_encoder(game.snapshot()).encode())
+            rows.append(cached[1])
+    return rows
+
+def encode_snapshot(rows: Sequence[bytes], saved_at: float, lsn: int) -> bytes:
+    header = default_encoder({
+        "format": SNAPSHOT_FORMAT,
+        "saved_at": saved_at,
+        "wal_lsn": lsn
+    }).encode()
+    return b"\n".join((header, *rows, b""))
+
+def write_snapshot(path: str, rows: Sequence[bytes], saved_at: float, lsn: int) -> int:
+    # Runs in a worker thread: join, compress, then write-and-rename so readers
+    # only ever see a complete file
+    data = gzip.compress(encode_snapshot(rows, saved_at, lsn), compresslevel=1)
+    tmp_path = f"{path}.tmp"
+    with snapshot_write_lock:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    return len(data)
+
+def load_snapshot(path: str) -> Tuple[Dict[str, Game], int]:
+    # Returns the games and the last WAL record they include
+    with gzip.open(path, "rb") as f, paused_gc():
+        header = decode_json(f.readline())
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format: {header.get('format')}")
+        restored = {}
+        for line in f:
+            game = Game.restore(decode_json(line))
+            # Unchanged games go into the next snapshot without being re-encoded
+            game.snapshot_row = (game.version, line.rstrip(b"\n"))
+            restored[game.code] = game
+        return restored, header.get("wal_lsn", 0)
+
+async def save_snapshot(path: str):
+    start = time.perf_counter()
+    lsn = wal.lsn if wal else 0
+    rows = snapshot_rows()
+    encoded = time.perf_counter()
+    size = await asyncio.to_thread(write_snapshot, path, rows, time.time(), lsn)
+    if wal:
+        # Older segments are now covered by the snapshot
+        await asyncio.to_thread(wal.prune, lsn)
+    metrics["snapshots"] += 1
+    metrics["snapshot_games"] = len(games)
+    metrics["snapshot_bytes"] = size
+    metrics["snapshot_encode_ms"] = (encoded - start) * 1000
+    metrics["snapshot_write_ms"] = (time.perf_counter() - encoded) * 1000
+
+def restore_snapshot(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    start = time.perf_counter()
+    restored, lsn = load_snapshot(path)
+    games.update(restored)
+    # Restored games are long-lived; keep them out of future collections
+    gc.freeze()
+    metrics["restored_games"] = len(restored)
+    metrics["restore_ms"] = (time.perf_counter() - start) * 1000
+    return lsn
+
+async def snapshot_forever():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        await save_snapshot(SNAPSHOT_PATH)
+
+# Write-ahead log: one JSON line per mutation, in numbered segment files
+WAL_PATH = os.environ.get("BINGO_WAL_PATH", "")
+WAL_COMMIT_DELAY = float(os.environ.get("BINGO_WAL_COMMIT_MS", "2")) / 1000
+WAL_SEGMENT_BYTES = 64 * 1024 * 1024
+
+class WriteAheadLog:
+    """Append-only mutation journal with group commit.
+
+    Records queue up while a flush is in flight and go out together in one
+    write + fsync, so bursts share the fsync cost. append() returns once the
+    record is durable.
+    """
+
+    def __init__(self, path: str, commit_delay: float = WAL_COMMIT_DELAY, segment_bytes: int = WAL_SEGMENT_BYTES):
+        self.path = path
+        self.commit_delay = commit_delay
+        self.segment_bytes = segment_bytes
+        self.lsn = 0  # last record number handed out
+        self.pending: List[bytes] = []
+        self.waiters: List[asyncio.Future] = []
+        self.flusher: Optional[asyncio.Task] = None
+        # Current segment; only touched from the flusher's worker thread
+        self.file = None
+        self.file_path: Optional[str] = None
+        self.file_size = 0
+    
+    def segments(self) -> List[Tuple[int, str]]:
+        # (first lsn, path) for every segment, oldest first
+        directory, prefix = os.path.split(os.path.abspath(self.path))
+        prefix += "."
+        found = []
+        for name in os.listdir(directory):
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                found.append((int(suffix), os.path.join(directory, name)))
+        return sorted(found)
+    
+    async def append(self, *record):
+        self.lsn += 1
+        self.pending.append(default_encoder([self.lsn, *record]).encode() + b"\n")
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.create_task(self._flush())
+        await waiter
+    
+    async def _flush(self):
+        while self.pending:
+            if self.commit_delay:
+                # Let the rest of a burst join this batch
+                await asyncio.sleep(self.commit_delay)
+            lines, waiters = self.pending, self.waiters
+            self.pending, self.waiters = [], []
+            first_lsn = self.lsn - len(lines) + 1
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, first_lsn, b"".join(lines))
+            except Exception as exc:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+                continue
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            metrics["wal_batches"] += 1
+            metrics["wal_records"] += len(lines)
+            metrics["wal_fsync_ms"] = (time.perf_counter() - start) * 1000
+    
+    def _write(self, first_lsn: int, data: bytes):
+        if self.file is None or self.file_size >= self.segment_bytes:
+            if self.file:
+                self.file.close()
+            self.file_path = f"{self.path}.{first_lsn:012d}"
+            self.file = open(self.file_path, "ab")
+            self.file_size = 0
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file_size += len(data)
+    
+    def rotate(self):
+        # Start a new segment on the next flush so the current one can be pruned
+        self.file_size = self.segment_bytes
+    
+    def prune(self, snapshot_lsn: int):
+        # Delete segments whose every record is covered by a snapshot at snapshot_lsn
+        self.rotate()
+        segments = self.segments()
+        for (_, path), (next_lsn, _) in zip(segments, segments[1:]):
+            if next_lsn <= snapshot_lsn + 1 and path != self.file_path:
+                os.remove(path)
+    
+    def replay(self, after_lsn: int) -> int:
+        replayed = 0
+        for _, path in self.segments():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        lsn, *record = decode_json(line)
+                    except ValueError:
+                        # Torn write at the tail of the last segment
+                        break
+                    self.lsn = max(self.lsn, lsn)
+                    if lsn > after_lsn:
+                        replay_record(*record)
+                        replayed += 1
+        return replayed
+    
+    async def close(self):
+        if self.flusher:
+            await self.flusher
+        if self.file:
+            self.file.close()
+            self.file = None
+
+wal: Optional[WriteAheadLog] = None
+
+async def journal(*record):
+    if wal:
+        await wal.append(*record)
+
+def replay_record(op: str, code: str, *args):
+    if op == "create":
+        apply_create(code, *args)
+        return
+    game = games.get(code)
+    if game is None:
+        return
+    if op == "join":
+        apply_join(game, *args)
+    elif op == "cell":
+        apply_update_cell(game, *args)
+    elif op == "start":
+        apply_start(game, *args)
+    elif op == "pcell":
+        name, index, value = args
+        apply_update_player_cell(game, game.players[name], index, value)
+    elif op == "pcells":
+        name, edits = args
+        apply_update_player_cells(game, game.players[name], edits)
+    elif op == "finish":
+        name, finish_time = args
+        apply_finish(game, game.players[name], finish_time)
+
+def recover():
+    # Latest snapshot, then every WAL record after it
+    global wal
+    games.load()
+    lsn = restore_snapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else 0
+    if WAL_PATH:
+        wal = WriteAheadLog(WAL_PATH)
+        start = time.perf_counter()
+        metrics["wal_replayed"] = wal.replay(lsn)
+        metrics["wal_replay_ms"] = (time.perf_counter() - start) * 1000
+    for game in games.values():
+        if game.end_time and not game.ended:
+            # Deadlines that passed while we were down fire straight away
+            timers.schedule(game)
+
+async def end_game(code: str):
+    with games.transaction():
+        # Re-read: with several workers, another one may have ended it already
+        game = games.get(code)
+        if game is None or game.ended:
+            return
+        apply_end(game)
+        seq = game.version
+    await manager.broadcast(code, {
+        "type": "game_over",
+        "end_time": game.end_time
+    }, seq=seq)
 
 # Routes
 @app.post("/api/games/create")
 async def create_game(request: CreateGameRequest):
-    code = generate_game_code()
-    while code in games:
+    with games.transaction():
         code = generate_game_code()
+        while code in games:
+            code = generate_game_code()
+        
+        game = apply_create(code, request.duration, time.time())
+        reply = {"game_code": code, "game": game.to_dict()}
+    await journal("create", code, game.duration, game.created_at)
     
-    games[code] = {
-        "code": code,
-        "cells": get_default_cells(),
-        "players": {},
-        "started": False,
-        "duration": request.duration,
-        "start_time": None,
-        "finished": [],
-        "created_at": time.time()
-    }
-    
-    return {"game_code": code, "game": games[code]}
+    return reply
 
 @app.get("/api/games/{game_code}")
-async def get_game(game_code: str):
+async def get_game(game_code: str, request: Request):
     if game_code not in games:
         raise HTTPException(status_code=404, detail="Game not found")
-    return games[game_code]
+    game = games[game_code]
+    return cached_response(request, game, "game", game.to_dict)
 
 @app.post("/api/games/join")
 async def join_game(request: JoinGameRequest):
     game_code = request.game_code.upper()
     
-    if game_code not in games:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    game = games[game_code]
-    
-    if request.player_name in game["players"]:
-        return {"message": "Player already in game", "game": game}
-    
-    game["players"][request.player_name] = {
-        "name": request.player_name,
-        "grid": [""] * 25,
-        "completed": False,
-        "finish_time": None,
-        "joined_at": time.time()
-    }
+    with games.transaction():
+        if game_code not in games:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        game = games[game_code]
+        
+        if request.player_name in game.players:
+            return acknowledge(game, request.full, message="Player already in game",
+                               player_count=len(game.players))
+        
+        player = apply_join(game, request.player_name, time.time())
+        # Read before the WAL wait: other requests can change the game meanwhile
+        player_count = len(game.players)
+        reply = acknowledge(game, request.full, message="Joined successfully",
+                            player_count=player_count)
+        seq = game.version
+    await journal("join", game_code, player.name, player.joined_at)
     
     # Broadcast update
     await manager.broadcast(game_code, {
         "type": "player_joined",
         "player_name": request.player_name,
-        "player_count": len(game["players"])
-    })
+        "player_count": player_count
+    }, seq=seq)
     
-    return {"message": "Joined successfully", "game": game}
+    return reply
 
 @app.post("/api/games/update-cell")
 async def update_cell(request: UpdateCellRequest):
     game_code = request.game_code.upper()
     
-    if game_code not in games:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    game = games[game_code]
-    
-    if game["started"]:
-        raise HTTPException(status_code=400, detail="Cannot edit cells after game started")
-    
-    if request.index < 0 or request.index >= 25:
-        raise HTTPException(status_code=400, detail="Invalid cell index")
-    
-    if request.index == 12:
-        raise HTTPException(status_code=400, detail="Cannot edit FREE SPACE")
-    
-    game["cells"][request.index] = request.value
+    with games.transaction():
+        if game_code not in games:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        game = games[game_code]
+        
+        if game.started:
+            raise HTTPException(status_code=400, detail="Cannot edit cells after game started")
+        
+        if request.index < 0 or request.index >= 25:
+            raise HTTPException(status_code=400, detail="Invalid cell index")
+        
+        if request.index == 12:
+            raise HTTPException(status_code=400, detail="Cannot edit FREE SPACE")
+        
+        apply_update_cell(game, request.index, request.value)
+        reply = acknowledge(game, request.full, message="Cell updated",
+                            index=request.index, value=request.value)
+        seq = game.version
+    await journal("cell", game_code, request.index, request.value)
     
     # Broadcast update
     await manager.broadcast(game_code, {
         "type": "cell_updated",
         "index": request.index,
         "value": request.value
-    })
+    }, coalesce_key=f"cell:{request.index}", seq=seq)
     
-    return {"message": "Cell updated", "game": game}
+    return reply
 
 @app.post("/api/games/start")
 async def start_game(request: StartGameRequest):
     game_code = request.game_code.upper()
     
-    if game_code not in games:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    game = games[game_code]
-    
-    if game["started"]:
-        raise HTTPException(status_code=400, detail="Game already started")
-    
-    if len(game["players"]) == 0:
-        raise HTTPException(status_code=400, detail="No players in game")
-    
-    game["started"] = True
-    game["start_time"] = time.time()
+    with games.transaction():
+        if game_code not in games:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        game = games[game_code]
+        
+        if game.started:
+            raise HTTPException(status_code=400, detail="Game already started")
+        
+        if len(game.players) == 0:
+            raise HTTPException(status_code=400, detail="No players in game")
+        
+        apply_start(game, time.time())
+        reply = acknowledge(game, request.full, message="Game started",
+                            start_time=game.start_time, end_time=game.end_time)
+        seq = game.version
+    if game.end_time:
+        timers.schedule(game)
+    await journal("start", game_code, game.start_time)
     
     # Broadcast game start
     await manager.broadcast(game_code, {
         "type": "game_started",
-        "start_time": game["start_time"]
-    })
+        "start_time": game.start_time,
+        "end_time": game.end_time
+    }, seq=seq)
     
-    return {"message": "Game started", "game": game}
+    return reply
 
 @app.post("/api/games/update-player-cell")
 async def update_player_cell(request: UpdatePlayerCellRequest):
     game_code = request.game_code.upper()
     
-    if game_code not in games:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    game = games[game_code]
+    with games.transaction():
+        if game_code not in games:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        game = games[game_code]
+        
+        if not game.started:
+            raise HTTPException(status_code=400, detail="Game not started yet")
+        
+        # Checked against the clock too, so a write can't slip in before the timer fires
+        if game.ended or (game.end_time and time.time() >= game.end_time):
+            raise HTTPException(status_code=400, detail="Game is over")
+        
+        if request.player_name not in game.players:
+            raise HTTPException(status_code=404, detail="Player not found")
+        
+        player = game.players[request.player_name]
+        
+        if player.completed:
+            raise HTTPException(status_code=400, detail="Player already finished")
+        
+        if request.cell_index < 0 or request.cell_index >= 25:
+            raise HTTPException(status_code=400, detail="Invalid cell index")
+        
+        was_ready = player.filled == FILLABLE_CELLS
+        apply_update_player_cell(game, player, request.cell_index, request.name_value)
+        ready = player.filled == FILLABLE_CELLS
+        reply = {"message": "Cell updated", "player": player.to_dict(), "ready_to_finish": ready}
+        seq = game.version
+    await journal("pcell", game_code, player.name, request.cell_index, request.name_value)
     
-    if not game["started"]:
-        raise HTTPException(status_code=400, detail="Game not started yet")
+    if ready and not was_ready:
+        # Hint clients that this card can now be submitted
+        await manager.broadcast(game_code, {
+            "type": "player_ready",
+            "player_name": request.player_name
+        }, seq=seq)
     
-    if request.player_name not in game["players"]:
-        raise HTTPException(status_code=404, detail="Player not found")
+    return reply
+
+MAX_BATCH_EDITS = 100
+
+@app.post("/api/games/update-player-cells")
+async def update_player_cells(request: UpdatePlayerCellsRequest):
+    # Debounced client edits: validated as a whole, then applied together or not at all
+    game_code = request.game_code.upper()
     
-    player = game["players"][request.player_name]
+    if not request.edits:
+        raise HTTPException(status_code=400, detail="No edits")
     
-    if player["completed"]:
-        raise HTTPException(status_code=400, detail="Player already finished")
+    if len(request.edits) > MAX_BATCH_EDITS:
+        raise HTTPException(status_code=400, detail="Too many edits")
     
-    if request.cell_index < 0 or request.cell_index >= 25:
+    if any(edit.cell_index < 0 or edit.cell_index >= 25 for edit in request.edits):
         raise HTTPException(status_code=400, detail="Invalid cell index")
     
-    player["grid"][request.cell_index] = request.name_value
+    edits = [(edit.cell_index, edit.name_value) for edit in request.edits]
+    
+    with games.transaction():
+        if game_code not in games:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        game = games[game_code]
+        
+        if not game.started:
+            raise HTTPException(status_code=400, detail="Game not started yet")
+        
+        if game.ended or (game.end_time and time.time() >= game.end_time):
+            raise HTTPException(status_code=400, detail="Game is over")
+        
+        if request.player_name not in game.players:
+            raise HTTPException(status_code=404, detail="Player not found")
+        
+        player = game.players[request.player_name]
+        
+        if player.completed:
+            raise HTTPException(status_code=400, detail="Player already finished")
+        
+        was_ready = player.filled == FILLABLE_CELLS
+        apply_update_player_cells(game, player, edits)
+        ready = player.filled == FILLABLE_CELLS
+        # Compact: the client already holds its grid
+        reply = {"applied": len(edits), "filled": player.filled, "ready_to_finish": ready}
+        seq = game.version
+    await journal("pcells", game_code, player.name, edits)
+    
+    if ready and not was_ready:
+        await manager.broadcast(game_code, {
+            "type": "player_ready",
+            "player_name": request.player_name
+        }, seq=seq)
     
-    return {"message": "Cell updated", "player": player}
+    return reply
 
 @app.post("/api/games/finish")
 async def finish_game(request: FinishGameRequest):
     game_code = request.game_code.upper()
     
-    if game_code not in games:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    game = games[game_code]
-    
-    if request.player_name not in game["players"]:
-        raise HTTPException(status_code=404, detail="Player not found")
-    
-    player = game["players"][request.player_name]
-    
-    if player["completed"]:
-        raise HTTPException(status_code=400, detail="Player already finished")
-    
-    # Verify all cells are filled (except index 12 which is FREE)
-    for i, cell in enumerate(player["grid"]):
-        if i != 12 and not cell.strip():
+    with games.transaction():
+        if game_code not in games:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        game = games[game_code]
+        
+        if request.player_name not in game.players:
+            raise HTTPException(status_code=404, detail="Player not found")
+        
+        player = game.players[request.player_name]
+        
+        if player.completed:
+            raise HTTPException(status_code=400, detail="Player already finished")
+        
+        # Verify all cells are filled (except index 12 which is FREE)
+        if player.filled != FILLABLE_CELLS:
             raise HTTPException(status_code=400, detail="Not all cells are filled")
-    
-    finish_time = time.time()
-    player["completed"] = True
-    player["finish_time"] = finish_time
-    
-    game["finished"].append({
-        "name": request.player_name,
-        "time": finish_time,
-        "elapsed": finish_time - game["start_time"]
-    })
-    
-    # Sort finished list by time
-    game["finished"].sort(key=lambda x: x["elapsed"])
+        
+        finish_time = time.time()
+        position = apply_finish(game, player, finish_time)
+        reply = {"message": "Game finished", "position": position, "player": player.to_dict()}
+        seq = game.version
+    await journal("finish", game_code, player.name, finish_time)
     
     # Broadcast finish
     await manager.broadcast(game_code, {
         "type": "player_finished",
         "player_name": request.player_name,
         "finish_time": finish_time,
-        "position": len(game["finished"])
-    })
+        "position": position
+    }, seq=seq)
     
-    return {"message": "Game finished", "position": len(game["finished"]), "player": player}
+    return reply
+
+@app.get("/api/games/{game_code}/leaderboard")
+async def get_leaderboard(game_code: str, offset: int = 0, limit: int = 50):
+    if game_code not in games:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    if offset < 0 or limit < 1 or limit > 500:
+        raise HTTPException(status_code=400, detail="Invalid page")
+    
+    finished = games[game_code].finished
+    entries = [
+        {"rank": rank, **entry}
+        for rank, entry in enumerate(finished[offset:offset + limit], start=offset + 1)
+    ]
+    
+    return {"total": len(finished), "offset": offset, "limit": limit, "entries": entries}
 
 @app.get("/api/games/{game_code}/insights")
-async def get_insights(game_code: str):
+async def get_insights(game_code: str, request: Request):
     if game_code not in games:
         raise HTTPException(status_code=404, detail="Game not found")
     
     game = games[game_code]
-    insights = []
     
-    for idx, cell in enumerate(game["cells"]):
-        if idx == 12:  # Skip FREE SPACE
-            continue
-        
-        entries = []
-        for player in game["players"].values():
-            name = player["grid"][idx]
-            if name.strip():
-                entries.append(name)
-        
-        # Count occurrences
-        counts = {}
-        for name in entries:
-            counts[name] = counts.get(name, 0) + 1
-        
-        insights.append({
-            "index": idx,
-            "cell": cell,
-            "total_entries": len(entries),
-            "unique_entries": len(counts),
-            "name_counts": counts
-        })
+    def build():
+        return {"insights": game.insights.insights(game.cells)}
     
-    return {"insights": insights}
+    return cached_response(request, game, "insights", build)
+
+# WebSocket commands
+# Message type -> (route, request model); the socket's game code fills in game_code
+WS_COMMANDS: Dict[str, Tuple[Callable[[Any], Any], type]] = {
+    "join": (join_game, JoinGameRequest),
+    "update-cell": (update_cell, UpdateCellRequest),
+    "start": (start_game, StartGameRequest),
+    "update-player-cell": (update_player_cell, UpdatePlayerCellRequest),
+    "update-player-cells": (update_player_cells, UpdatePlayerCellsRequest),
+    "finish": (finish_game, FinishGameRequest),
+}
+
+def parse_command(data: str) -> Optional[dict]:
+    # Any JSON object with a string "type"; the endpoint decides whether it names a command
+    try:
+        command = decode_json(data)
+    except ValueError:
+        return None
+    if isinstance(command, dict) and isinstance(command.get("type"), str):
+        return command
+    return None
+
+async def run_command(game_code: str, command: dict) -> dict:
+    # Clients match the reply to their command by the echoed id
+    reply = {"type": "result", "id": command.get("id")}
+    route, model = WS_COMMANDS[command["type"]]
+    try:
+        result = await route(model(**{**command, "game_code": game_code}))
+    except ValidationError as e:
+        detail = e.errors(include_url=False, include_context=False, include_input=False)
+        return {**reply, "ok": False, "status": 422, "detail": detail}
+    except HTTPException as e:
+        return {**reply, "ok": False, "status": e.status_code, "detail": e.detail}
+    return {**reply, "ok": True, "data": result}
+
+def negotiate_encoding(websocket: WebSocket, encoding: Optional[str]) -> Tuple[Optional[Callable[[Any], Frame]], Optional[str]]:
+    # A "bingo.<name>" subprotocol wins over ?encoding=; anything unknown gets JSON
+    for subprotocol in websocket.scope.get("subprotocols", []):
+        name = subprotocol.removeprefix("bingo.")
+        if subprotocol.startswith("bingo.") and (name == "json" or name in WIRE_ENCODERS):
+            return WIRE_ENCODERS.get(name), subprotocol
+    return WIRE_ENCODERS.get(encoding or ""), None
 
 @app.websocket("/ws/{game_code}")
-async def websocket_endpoint(websocket: WebSocket, game_code: str):
-    await manager.connect(websocket, game_code.upper())
+async def websocket_endpoint(websocket: WebSocket, game_code: str, since: Optional[int] = None,
+                             encoding: Optional[str] = None):
+    game_code = game_code.upper()
+    encoder, subprotocol = negotiate_encoding(websocket, encoding)
+    await manager.connect(websocket, game_code, encoder, subprotocol)
+    if since is not None:
+        # Resume: no await since connect, so nothing is broadcast in between
+        game = games.get(game_code)
+        if game is not None and since < game.version:
+            metrics["ws_resumes"] += 1
+            if not manager.resume(websocket, game_code, since):
+                # The gap fell out of the buffer: current state instead
+                metrics["ws_resume_snapshots"] += 1
+                await manager.send(websocket, game_code, {
+                    "type": "snapshot",
+                    "seq": game.version,
+                    "game": game.to_dict()
+                })
     try:
         while True:
-            # Keep connection alive
             data = await websocket.receive_text()
-            # Echo back to confirm connection
-            await websocket.send_json({"type": "ping", "message": "connected"})
+            command = parse_command(data)
+            if command is None or command["type"] not in WS_COMMANDS:
+                # Keepalives, {"type": "ping"} included: echo back to confirm connection
+                await manager.send(websocket, game_code, {"type": "ping", "message": "connected"})
+                continue
+            # One at a time, so a socket's commands apply in the order sent
+            await manager.send(websocket, game_code, await run_command(game_code, command))
     except WebSocketDisconnect:
-        manager.disconnect(websocket, game_code.upper())
+        pass
+    finally:
+        # Any error out of the loop still drops the socket from the room
+        manager.disconnect(websocket, game_code)
+
+@app.get("/api/history")
+async def get_history(offset: int = 0, limit: int = 50):
+    if offset < 0 or limit < 1 or limit > 500:
+        raise HTTPException(status_code=400, detail="Invalid page")
+    
+    return {"offset": offset, "limit": limit, "games": await games.history(limit, offset)}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        **metrics,
+        "active_games": len(games),
+        "active_sockets": sum(len(c) for c in manager.active_connections.values()),
+        "slow_consumers_evicted": manager.evicted,
+        "broadcasts_coalesced": manager.coalesced,
+    }
 
 @app.get("/")
 async def root():
     return {"message": "People Bingo API", "active_games": len(games)}
 
+# WebSocket permessage-deflate and keepalive pings
+# uvicorn only turns the extension on or off; these expose its negotiation settings
+WS_DEFLATE = os.environ.get("BINGO_WS_DEFLATE", "1") == "1"
+WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER = os.environ.get("BINGO_WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER", "0") == "1"
+WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER = os.environ.get("BINGO_WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER", "0") == "1"
+WS_DEFLATE_WINDOW_BITS = int(os.environ.get("BINGO_WS_DEFLATE_WINDOW_BITS", "15"))
+WS_DEFLATE_LEVEL = int(os.environ.get("BINGO_WS_DEFLATE_LEVEL", "6"))
+WS_DEFLATE_MEM_LEVEL = int(os.environ.get("BINGO_WS_DEFLATE_MEM_LEVEL", "5"))
+
+try:
+    from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+    from websockets.exceptions import ConnectionClosed
+    from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+except ImportError:  # no websockets library: uvicorn picks its own implementation
+    WebSocketProtocol = None
+
+if WebSocketProtocol:
+    class BingoWebSocketProtocol(WebSocketProtocol):
+        """uvicorn's websockets protocol with our deflate settings and shared-timer pings."""
+
+        # Open connections, pinged together by heartbeat_forever
+        instances: Set["BingoWebSocketProtocol"] = set()
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if WS_DEFLATE:
+                # Without context takeover each frame compresses alone: less memory per
+                # socket, worse ratio on the small, similar frames we broadcast
+                self.available_extensions = [ServerPerMessageDeflateFactory(
+                    server_no_context_takeover=WS_DEFLATE_SERVER_NO_CONTEXT_TAKEOVER,
+                    client_no_context_takeover=WS_DEFLATE_CLIENT_NO_CONTEXT_TAKEOVER,
+                    server_max_window_bits=WS_DEFLATE_WINDOW_BITS if WS_DEFLATE_WINDOW_BITS < 15 else None,
+                    compress_settings={"level": WS_DEFLATE_LEVEL, "memLevel": WS_DEFLATE_MEM_LEVEL},
+                )]
+        
+        def connection_made(self, transport):
+            super().connection_made(transport)
+            self.instances.add(self)
+        
+        def connection_lost(self, exc):
+            self.instances.discard(self)
+            super().connection_lost(exc)
+        
+        @classmethod
+        async def ping_all(cls, max_missed: int) -> int:
+            # A pong settles its ping and every earlier one, so the pings still
+            # pending are the rounds a socket has left unanswered
+            reaped = 0
+            for i, protocol in enumerate(list(cls.instances)):
+                if i % 256 == 255:
+                    # Let other work run between slices of a large pass
+                    await asyncio.sleep(0)
+                if not protocol.open:
+                    continue
+                if len(protocol.pings) >= max_missed:
+                    protocol.fail_connection(1011, "keepalive ping timeout")
+                    reaped += 1
+                    continue
+                transport = protocol.transport
+                if transport.get_write_buffer_size() >= transport.get_write_buffer_limits()[1]:
+                    # Writes are paused: ping() would wait for this socket to drain
+                    continue
+                try:
+                    pong_waiter = await protocol.ping()
+                except ConnectionClosed:
+                    continue
+                # Never awaited: pending pings are counted instead. Cancelling the
+                # shield keeps a closed socket's ping from being logged as unretrieved
+                pong_waiter.cancel()
+            return reaped
+
+def server_options() -> dict:
+    # Extra uvicorn.run settings shared by every way of starting the server
+    if not WebSocketProtocol:
+        return {"ws_per_message_deflate": WS_DEFLATE}
+    options = {"ws": BingoWebSocketProtocol, "ws_per_message_deflate": WS_DEFLATE}
+    if WS_HEARTBEAT_INTERVAL > 0:
+        # heartbeat_forever replaces uvicorn's keepalive ping task per connection
+        options["ws_ping_interval"] = None
+    return options
+
+def broker_main(path: str):
+    asyncio.run(run_broker(path))
+
+def run_workers(host: str, port: int, workers: int):
+    import multiprocessing
+    import shutil
+    import tempfile
+    import uvicorn
+    
+    # Workers are fresh imports of this module, configured through the environment
+    relay_dir = tempfile.mkdtemp(prefix="bingo-")
+    relay_path = os.path.join(relay_dir, "relay.sock")
+    os.environ["BINGO_STORE"] = "shared-sqlite"
+    os.environ["BINGO_RELAY_SOCKET"] = relay_path
+    broker = multiprocessing.Process(target=broker_main, args=(relay_path,), daemon=True)
+    broker.start()
+    try:
+        uvicorn.run("backend:app", host=host, port=port, workers=workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)), **server_options())
+    finally:
+        broker.terminate()
+        broker.join()
+        shutil.rmtree(relay_dir, ignore_errors=True)
+
+# Front dispatcher
+def parse_head(head: bytes) -> Tuple[bytes, bytes, Dict[bytes, bytes]]:
+    # Request line or status line, plus lower-cased header names
+    lines = head.split(b"\r\n")
+    first, second = lines[0].split(b" ", 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip()
+    return first, second, headers
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while data := await reader.read(2 ** 16):
+            writer.write(data)
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+class Dispatcher:
+    """Front process for --shards: sends each request to its game's owner.
+
+    Works on raw HTTP/1.1. It reads a request's head and body only to find
+    the game code, then forwards the bytes unchanged over a kept-alive Unix
+    socket to the shard. WebSocket upgrades are spliced end to end, so
+    frames (and any negotiated extensions) pass through undecoded.
+    """
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self.next_shard = 0
+    
+    def pick(self, method: bytes, target: bytes, body: bytes) -> int:
+        path = target.split(b"?", 1)[0].decode()
+        code = None
+        if path.startswith("/ws/"):
+            code = path[len("/ws/"):].split("/", 1)[0]
+        elif method == b"GET" and path.startswith("/api/games/"):
+            code = path[len("/api/games/"):].split("/", 1)[0]
+        elif body:
+            # POST routes carry the code in the body; create has none
+            try:
+                code = decode_json(body).get("game_code")
+            except (ValueError, AttributeError):
+                pass
+        if isinstance(code, str) and code:
+            return shard_for(code, len(self.paths))
+        # Game creation and game-less routes spread round-robin
+        self.next_shard = (self.next_shard + 1) % len(self.paths)
+        return self.next_shard
+    
+    async def forward(self, upstreams: Dict[int, tuple], shard: int, request: bytes) -> tuple:
+        # Retries once: the shard may have closed a pooled connection while it sat idle
+        for attempt in (0, 1):
+            if shard not in upstreams:
+                upstreams[shard] = await asyncio.open_unix_connection(self.paths[shard])
+            reader, writer = upstreams[shard]
+            writer.write(request)
+            try:
+                return reader, await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                upstreams.pop(shard)[1].close()
+                if attempt:
+                    raise
+    
+    async def relay_response(self, method: bytes, head: bytes, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> bool:
+        # Copies one response; False when the connection can't be reused
+        writer.write(head)
+        _, status, headers = parse_head(head)
+        if method == b"HEAD" or int(status) < 200 or int(status) in (204, 304):
+            return True
+        if b"chunked" in headers.get(b"transfer-encoding", b""):
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                writer.write(line)
+                size = int(line.split(b";", 1)[0], 16)
+                if size:
+                    writer.write(await reader.readexactly(size + 2))
+                    continue
+                while line != b"\r\n":
+                    line = await reader.readuntil(b"\r\n")
+                    writer.write(line)
+                break
+        elif b"content-length" in headers:
+            writer.write(await reader.readexactly(int(headers[b"content-length"])))
+        else:
+            writer.write(await reader.read())
+            return False
+        return headers.get(b"connection", b"").lower() != b"close"
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        upstreams: Dict[int, tuple] = {}
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                method, target, headers = parse_head(head)
+                if b"chunked" in headers.get(b"transfer-encoding", b""):
+                    writer.write(b"HTTP/1.1 411 Length Required\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                    break
+                body = await reader.readexactly(int(headers.get(b"content-length", b"0")))
+                shard = self.pick(method, target, body)
+                if headers.get(b"upgrade", b"").lower() == b"websocket":
+                    up_reader, up_writer = await asyncio.open_unix_connection(self.paths[shard])
+                    up_writer.write(head + body)
+                    await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+                    break
+                try:
+                    up_reader, response_head = await self.forward(upstreams, shard, head + body)
+                except (OSError, asyncio.IncompleteReadError):
+                    writer.write(b"HTTP/1.1 502 Bad Gateway\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                    break
+                keep_alive = await self.relay_response(method, response_head, up_reader, writer)
+                await writer.drain()
+                if not keep_alive or headers.get(b"connection", b"").lower() == b"close":
+                    break
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            for _, up_writer in upstreams.values():
+                up_writer.close()
+            writer.close()
+
+async def run_dispatcher(host: str, port: int, paths: List[str]):
+    # Accept traffic only once every shard is listening
+    while not all(os.path.exists(path) for path in paths):
+        await asyncio.sleep(0.1)
+    server = await asyncio.start_server(Dispatcher(paths).handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+def run_shards(host: str, port: int, shards: int):
+    import shutil
+    import signal
+    import subprocess
+    import tempfile
+    
+    shard_dir = tempfile.mkdtemp(prefix="bingo-")
+    paths = [os.path.join(shard_dir, f"shard{index}.sock") for index in range(shards)]
+    processes = []
+    for index, path in enumerate(paths):
+        env = dict(os.environ, BINGO_SHARD_INDEX=str(index), BINGO_SHARD_COUNT=str(shards))
+        # Each shard keeps its own snapshot and WAL files
+        for name in ("BINGO_SNAPSHOT_PATH", "BINGO_WAL_PATH"):
+            if env.get(name):
+                env[name] = f"{env[name]}.{index}"
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--uds", path], env=env))
+    # SIGTERM unwinds like Ctrl-C, so the shards are stopped too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(run_dispatcher(host, port, paths))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    parser = argparse.ArgumentParser(description="People Bingo backend")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--uds", help="serve on a Unix socket (used for shard processes)")
+    args = parser.parse_args()
+    if args.workers > 1 and args.shards > 1:
+        parser.error("--workers and --shards are alternative deployments")
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, **server_options())
+    elif args.shards > 1:
+        run_shards(args.host, args.port, args.shards)
+    elif args.workers > 1:
+        # Snapshot and WAL files are per-process; the shared store is the durable copy
+        if SNAPSHOT_PATH or WAL_PATH:
+            parser.error("BINGO_SNAPSHOT_PATH and BINGO_WAL_PATH are single-worker only")
+        run_workers(args.host, args.port, args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, **server_options())
@@ -0,0 +1,708 @@
+"""
+People Bingo - backend micro-benchmarks
+
+Run all benchmarks:
+   python bench.py
+
+Run one benchmark:
+   python bench.py broadcast_encoding
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import backend
+
+
+class NullSocket:
+    # Stands in for a WebSocket: accepts frames without doing any I/O
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def send_bytes(self, data):
+        pass
+
+
+class SerializingSocket(NullSocket):
+    # Mimics send_json: pays for json.dumps of the message on every send
+    def __init__(self, message):
+        self.message = message
+
+    async def send_text(self, data):
+        backend.encode_json(self.message)
+
+
+async def atimed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat
+
+
+async def connect_all(manager, game_code, sockets):
+    for socket in sockets:
+        await manager.connect(socket, game_code)
+
+
+async def drain(manager):
+    # Let every writer task empty its queue
+    while any(
+        outbox.queue
+        for connections in manager.active_connections.values()
+        for outbox in connections.values()
+    ):
+        await asyncio.sleep(0)
+
+
+def bench_broadcast_encoding(sockets: int = 500, repeat: int = 200):
+    message = {
+        "type": "player_finished",
+        "player_name": "Ada Lovelace",
+        "finish_time": time.time(),
+        "position": 17,
+    }
+
+
+    async def run_broadcast(encoder, connections):
+        manager = backend.ConnectionManager(encoder=encoder, high_water=repeat + 1)
+        await connect_all(manager, "BENCH", connections)
+
+        async def once():
+            await manager.broadcast("BENCH", message)
+            await drain(manager)
+
+        return await atimed(once, repeat)
+
+    # Same fan-out machinery in every run, so the difference is serialization only
+    baseline = asyncio.run(
+        run_broadcast(backend.encode_json, [SerializingSocket(message) for _ in range(sockets)])
+    )
+    print(f"broadcast to {sockets} sockets ({repeat} runs)")
+    print(f"  json.dumps per socket : {baseline * 1e3:8.3f} ms")
+    encoders = [("json once", backend.encode_json)]
+    if backend.orjson:
+        encoders.append(("orjson once", backend.encode_orjson))
+    for label, encoder in encoders:
+        elapsed = asyncio.run(run_broadcast(encoder, [NullSocket() for _ in range(sockets)]))
+        print(f"  {label:<22}: {elapsed * 1e3:8.3f} ms (saves {(baseline - elapsed) * 1e3:.3f} ms)")
+
+def bench_disconnect_storm(sizes=(1000, 4000, 16000)):
+    # Every socket in one room drops at once; cost per socket should stay flat
+
+    async def storm(n):
+        manager = backend.ConnectionManager()
+        sockets = [NullSocket() for _ in range(n)]
+        await connect_all(manager, "BENCH", sockets)
+        start = time.perf_counter()
+        for socket in sockets:
+            manager.disconnect(socket, "BENCH")
+        elapsed = time.perf_counter() - start
+        assert "BENCH" not in manager.active_connections
+        return elapsed
+
+    print("mass disconnect")
+    for n in sizes:
+        elapsed = asyncio.run(storm(n))
+        print(f"  {n:>6} sockets: {elapsed * 1e3:8.3f} ms ({elapsed / n * 1e6:.2f} us/socket)")
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_insights(sizes=(100, 1000, 5000), repeat: int = 20):
+    rnd = random.Random(0)
+    names = [f"Person {i}" for i in range(200)]
+    print("insights per poll")
+    for n in sizes:
+        game = backend.Game("BENCH", 15, time.time())
+        for p in range(n):
+            player = backend.Player(f"p{p}", time.time())
+            for i in range(25):
+                backend.write_player_cell(game, player, i, rnd.choice(names))
+            game.players[player.name] = player
+        # Overwrites and clears, then the incremental index must still match a rescan
+        players = list(game.players.values())
+        for _ in range(n * 5):
+            value = rnd.choice(names + ["", "  "])
+            backend.write_player_cell(game, rnd.choice(players), rnd.randrange(25), value)
+        backend.games[game.code] = game
+        mismatched = backend.check_insights(game.code)
+        assert not mismatched, f"insights out of step at cells {mismatched}"
+        rescan = timed(lambda: backend.rescan_insights(game), repeat)
+        incremental = timed(lambda: game.insights.insights(game.cells), repeat)
+        print(f"  {n:>5} players: rescan {rescan * 1e3:8.3f} ms, incremental {incremental * 1e3:8.3f} ms")
+        del backend.games[game.code]
+
+
+def allocated(build) -> int:
+    # Bytes still allocated by whatever build() returns
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def bench_player_memory(players: int = 20000):
+    names = [f"Player {i}" for i in range(players)]
+
+    def as_dicts():
+        # Layout before the Player class: one dict per player
+        return {
+            name: {
+                "name": name,
+                "grid": [""] * 25,
+                "filled": 0,
+                "completed": False,
+                "finish_time": None,
+                "joined_at": time.time(),
+            }
+            for name in names
+        }
+
+    def as_slots():
+        return {name: backend.Player(name, time.time()) for name in names}
+
+    print(f"memory for {players} players (excluding name strings)")
+    for label, build in (("dict", as_dicts), ("__slots__", as_slots)):
+        print(f"  {label:<10}: {allocated(build) / players:7.1f} bytes/player")
+
+
+def bench_game_creation(count: int = 10000):
+    # A burst of rooms that never edit their board
+
+    def copied_boards():
+        # Previous behaviour: a fresh 25-string list per game
+        games = []
+        for i in range(count):
+            game = backend.Game(f"G{i}", 15, time.time())
+            game.cells = list(backend.DEFAULT_CELLS)
+            games.append(game)
+        return games
+
+    def shared_boards():
+        return [backend.Game(f"G{i}", 15, time.time()) for i in range(count)]
+
+    print(f"creating {count} games")
+    for label, build in (("copied board", copied_boards), ("shared board", shared_boards)):
+        start = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - start
+        print(f"  {label}: {allocated(build) / count:7.1f} bytes/game, {elapsed / count * 1e6:.2f} us/game")
+
+
+def populate(count: int, players_per_game: int, filled: int = 12):
+    # Fill backend.games with started games whose players have part-filled cards
+    rnd = random.Random(0)
+    backend.games.clear()
+    now = time.time()
+    for g in range(count):
+        game = backend.Game(f"G{g:07d}", 15, now)
+        game.started = True
+        game.start_time = now
+        for p in range(players_per_game):
+            player = backend.Player(f"Player {p}", now)
+            for i in rnd.sample(range(25), filled):
+                backend.write_player_cell(game, player, i, f"Name {rnd.randrange(50)}")
+            game.players[player.name] = player
+        backend.games[game.code] = game
+
+
+def bench_snapshot(count: int = 100000, players_per_game: int = 5):
+    populate(count, players_per_game)
+    path = os.path.join(tempfile.mkdtemp(), "games.snapshot.json.gz")
+    asyncio.run(backend.save_snapshot(path))
+    m = backend.metrics
+    print(f"snapshot of {count} games x {players_per_game} players")
+    print(f"  encode (event loop) : {m['snapshot_encode_ms']:9.1f} ms")
+    print(f"  compress + write    : {m['snapshot_write_ms']:9.1f} ms (worker thread)")
+    print(f"  file size           : {m['snapshot_bytes'] / 1e6:9.2f} MB")
+    # The periodic case: most games unchanged since the last snapshot
+    for game in list(backend.games.values())[::100]:
+        backend.bump_version(game)
+    asyncio.run(backend.save_snapshot(path))
+    print(f"  again, 1% changed   : {m['snapshot_encode_ms']:9.1f} ms on the event loop, "
+          f"{m['snapshot_write_ms']:.1f} ms in the worker thread")
+    backend.games.clear()
+    backend.restore_snapshot(path)
+    print(f"  restore             : {m['restore_ms']:9.1f} ms ({m['restored_games']} games)")
+    asyncio.run(backend.save_snapshot(path))
+    print(f"  first after restore : {m['snapshot_encode_ms']:9.1f} ms on the event loop")
+    os.remove(path)
+    backend.games.clear()
+
+
+def bench_wal(records: int = 2000):
+    # fsync cost per record when requests arrive one at a time vs. in a burst
+
+    async def run(concurrent: bool):
+        directory = tempfile.mkdtemp()
+        wal = backend.WriteAheadLog(os.path.join(directory, "games.wal"))
+        batches = backend.metrics["wal_batches"]
+        start = time.perf_counter()
+        if concurrent:
+            await asyncio.gather(*(
+                wal.append("pcell", "BENCH", "Player", i % 25, "Name") for i in range(records)
+            ))
+        else:
+            for i in range(records):
+                await wal.append("pcell", "BENCH", "Player", i % 25, "Name")
+        elapsed = time.perf_counter() - start
+        await wal.close()
+        return elapsed, backend.metrics["wal_batches"] - batches
+
+    print(f"WAL append of {records} records")
+    for label, concurrent in (("one at a time", False), ("burst", True)):
+        elapsed, batches = asyncio.run(run(concurrent))
+        print(f"  {label:<14}: {elapsed / records * 1e6:8.1f} us/record, {batches} fsyncs")
+
+
+def bench_store(games_count: int = 200, players_per_game: int = 10, moves: int = 20):
+    # Route handler latency with each storage backend; SQLite writes happen in
+    # the background flush, so they should stay off the request path
+
+    async def run(store):
+        backend.games = store
+        flusher = asyncio.create_task(store.flush_forever())
+        latencies = []
+
+        async def call(route, request):
+            start = time.perf_counter()
+            result = await route(request)
+            latencies.append(time.perf_counter() - start)
+            return result
+
+        rnd = random.Random(0)
+        for _ in range(games_count):
+            code = (await call(backend.create_game, backend.CreateGameRequest()))["game_code"]
+            for p in range(players_per_game):
+                await call(backend.join_game, backend.JoinGameRequest(game_code=code, player_name=f"P{p}"))
+            await call(backend.start_game, backend.StartGameRequest(game_code=code))
+            for _ in range(moves):
+                await call(backend.update_player_cell, backend.UpdatePlayerCellRequest(
+                    game_code=code,
+                    player_name=f"P{rnd.randrange(players_per_game)}",
+                    cell_index=rnd.randrange(25),
+                    name_value=f"Name {rnd.randrange(100)}",
+                ))
+        flusher.cancel()
+        start = time.perf_counter()
+        await store.flush()
+        final_flush = time.perf_counter() - start
+        store.close()
+        latencies.sort()
+        return latencies, final_flush
+
+    original = backend.games
+    print(f"route latency, {games_count} games x {players_per_game} players")
+    try:
+        for label in ("memory", "sqlite"):
+            if label == "sqlite":
+                backend.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+            latencies, final_flush = asyncio.run(run(backend.create_store(label)))
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[int(len(latencies) * 0.99)]
+            print(
+                f"  {label:<7}: p50 {p50 * 1e6:7.1f} us, p99 {p99 * 1e6:7.1f} us, "
+                f"final flush {final_flush * 1e3:.1f} ms"
+            )
+    finally:
+        backend.games = original
+
+
+def start_server(*args, env=None):
+    # Runs backend.py on a free port and waits until it answers
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend.py"),
+         "--host", "127.0.0.1", "--port", str(port), *args],
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            http.client.HTTPConnection("127.0.0.1", port, timeout=1).request("GET", "/")
+            return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def bench_workers(workers=(1, 2, 4), clients: int = 32, games_count: int = 64, moves: int = 40):
+    # End-to-end HTTP throughput against `backend.py --workers/--shards N`; one game
+    # per client loop, so requests for different games can run on different cores
+
+    def play(port, index):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+
+        def post(path, body):
+            conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = json.loads(response.read())
+            assert response.status == 200, data
+            return data
+
+        code = post("/api/games/create", {})["game_code"]
+        for p in range(4):
+            post("/api/games/join", {"game_code": code, "player_name": f"P{p}"})
+        post("/api/games/start", {"game_code": code})
+        for m in range(moves):
+            post("/api/games/update-player-cell", {
+                "game_code": code, "player_name": f"P{m % 4}",
+                "cell_index": m % 25, "name_value": f"Name {m}",
+            })
+        conn.close()
+        return 6 + moves
+
+    print(f"HTTP throughput, {clients} clients, {games_count} games, {os.cpu_count()} cpus")
+    # One process keeps the in-memory store; --workers switches to the shared
+    # SQLite store, --shards keeps memory stores behind the dispatcher
+    deployments = [("--workers", 1)]
+    deployments += [(mode, count) for count in workers if count > 1 for mode in ("--workers", "--shards")]
+    for mode, count in deployments:
+        env = {"BINGO_SQLITE_PATH": os.path.join(tempfile.mkdtemp(), "bench.sqlite3")}
+        server, port = start_server(mode, str(count), env=env)
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(clients) as pool:
+                requests = sum(pool.map(lambda i: play(port, i), range(games_count)))
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+        label = "single process" if count == 1 else f"{mode} {count}"
+        print(f"  {label:<14}: {requests / elapsed:8.0f} req/s")
+
+
+def bench_player_cells(players: int = 100):
+    # Filling a whole card: one POST per cell versus one batched POST
+    from fastapi.testclient import TestClient
+
+    indices = [i for i in range(25) if i != 12]
+    with TestClient(backend.app) as client:
+        code = client.post("/api/games/create", json={}).json()["game_code"]
+        for p in range(players):
+            client.post("/api/games/join", json={"game_code": code, "player_name": f"P{p}"})
+        client.post("/api/games/start", json={"game_code": code})
+
+        start = time.perf_counter()
+        for p in range(players // 2):
+            for i in indices:
+                client.post("/api/games/update-player-cell", json={
+                    "game_code": code, "player_name": f"P{p}", "cell_index": i, "name_value": f"Name {i}",
+                })
+        single = (time.perf_counter() - start) / (players // 2)
+
+        start = time.perf_counter()
+        for p in range(players // 2, players):
+            client.post("/api/games/update-player-cells", json={
+                "game_code": code, "player_name": f"P{p}",
+                "edits": [{"cell_index": i, "name_value": f"Name {i}"} for i in indices],
+            })
+        batched = (time.perf_counter() - start) / (players - players // 2)
+    print(f"fill one card ({len(indices)} cells)")
+    print(f"  per-cell POSTs: {single * 1e3:7.2f} ms")
+    print(f"  one batch POST: {batched * 1e3:7.2f} ms")
+
+
+def bench_ws_commands(edits: int = 500):
+    # Round trip for one cell edit: REST POST versus a command on the open socket
+    from fastapi.testclient import TestClient
+
+    with TestClient(backend.app) as client:
+        code = client.post("/api/games/create", json={}).json()["game_code"]
+        client.post("/api/games/join", json={"game_code": code, "player_name": "P"})
+        client.post("/api/games/start", json={"game_code": code})
+
+        start = time.perf_counter()
+        for i in range(edits):
+            client.post("/api/games/update-player-cell", json={
+                "game_code": code, "player_name": "P", "cell_index": i % 25, "name_value": f"Name {i}",
+            })
+        rest = (time.perf_counter() - start) / edits
+
+        with client.websocket_connect(f"/ws/{code}") as ws:
+            start = time.perf_counter()
+            for i in range(edits):
+                ws.send_text(backend.encode_json({
+                    "id": i, "type": "update-player-cell", "player_name": "P",
+                    "cell_index": i % 25, "name_value": f"Name {i}",
+                }))
+                while ws.receive_json()["type"] != "result":
+                    pass
+            socket = (time.perf_counter() - start) / edits
+    print("one cell edit, round trip")
+    print(f"  REST POST : {rest * 1e6:7.0f} us")
+    print(f"  WS command: {socket * 1e6:7.0f} us")
+
+
+def bench_mutation_responses(players: int = 1000, repeat: int = 200):
+    # update_cell reply size and handler + encode time, slim versus full=True
+    populate(1, players)
+    code = next(iter(backend.games))
+    backend.games[code].started = False
+
+    async def run(full):
+        start = time.perf_counter()
+        for i in range(repeat):
+            result = await backend.update_cell(
+                backend.UpdateCellRequest(game_code=code, index=i % 12, value=f"Cell {i}", full=full)
+            )
+            body = backend.default_encoder(result)
+        return len(body), (time.perf_counter() - start) / repeat
+
+    print(f"update_cell response, {players} players")
+    for label, full in (("slim", False), ("full=True", True)):
+        size, elapsed = asyncio.run(run(full))
+        print(f"  {label:<9}: {size:8d} bytes, {elapsed * 1e6:8.1f} us")
+    backend.games.clear()
+
+
+def bench_resume(players: int = 300, missed: int = 5):
+    # A reconnect herd: every player catches up on a few missed events,
+    # either replayed from the buffer or by a full snapshot of the game
+    populate(1, players)
+    code, game = next(iter(backend.games.items()))
+
+    async def run(resume):
+        manager = backend.ConnectionManager(high_water=missed + 2)
+        since = game.version
+        for i in range(missed):
+            game.version += 1
+            await manager.broadcast(code, {"type": "cell_updated", "index": i, "value": "v"}, seq=game.version)
+        start = time.perf_counter()
+        sent = 0
+        for _ in range(players):
+            socket = NullSocket()
+            await manager.connect(socket, code)
+            if resume:
+                manager.resume(socket, code, since)
+                sent += sum(len(frame) for _, frame in manager.replay[code].since(since))
+            else:
+                frame = manager.encoder({"type": "snapshot", "seq": game.version, "game": game.to_dict()})
+                manager.active_connections[code][socket].put(frame)
+                sent += len(frame)
+        elapsed = time.perf_counter() - start
+        await drain(manager)
+        return elapsed / players, sent / players
+
+    print(f"reconnect catch-up, {players} players, {missed} missed events")
+    for label, resume in (("replay", True), ("snapshot", False)):
+        elapsed, size = asyncio.run(run(resume))
+        print(f"  {label:<8}: {size:9.0f} bytes, {elapsed * 1e6:8.1f} us per socket")
+    backend.games.clear()
+
+
+class CountingSocket(NullSocket):
+    sent = 0
+
+    async def send_text(self, data):
+        CountingSocket.sent += 1
+
+    async def send_bytes(self, data):
+        CountingSocket.sent += 1
+
+
+def bench_join_rush(players: int = 300, spacing: float = 0.002, windows=(0, 0.025)):
+    # Every joiner opens a socket and then joins, one join every `spacing` seconds;
+    # counts the frames sent to all sockets with and without a coalescing window
+
+    async def run(window):
+        manager = backend.manager = backend.ConnectionManager(coalesce_window=window, high_water=players)
+        code = (await backend.create_game(backend.CreateGameRequest()))["game_code"]
+        CountingSocket.sent = 0
+        start = time.perf_counter()
+        for p in range(players):
+            await manager.connect(CountingSocket(), code)
+            await backend.join_game(backend.JoinGameRequest(game_code=code, player_name=f"P{p}"))
+            await asyncio.sleep(spacing)
+        await asyncio.sleep(window)
+        await drain(manager)
+        return CountingSocket.sent, time.perf_counter() - start
+
+    original = backend.manager
+    print(f"join rush, {players} players, one join per {spacing * 1e3:.0f} ms")
+    try:
+        for window in windows:
+            sent, elapsed = asyncio.run(run(window))
+            label = f"window {window * 1e3:.0f} ms"
+            print(f"  {label:<12}: {sent:7d} frames, {elapsed:5.2f} s")
+    finally:
+        backend.manager = original
+        backend.games.clear()
+
+
+def bench_wire_formats(players: int = 300, repeat: int = 200):
+    # Bytes on the wire and encode time per event type, for each WebSocket encoding
+    populate(1, players)
+    game = next(iter(backend.games.values()))
+    now = time.time()
+    events = {
+        "player_joined": {"type": "player_joined", "player_name": "Ada Lovelace", "player_count": players, "seq": 812},
+        "cell_updated": {"type": "cell_updated", "index": 7, "value": "Has a pet", "seq": 813},
+        "player_finished": {
+            "type": "player_finished", "player_name": "Ada Lovelace", "finish_time": now, "position": 17, "seq": 814,
+        },
+        "players_joined": {
+            "type": "players_joined", "player_names": list(game.players), "player_count": players, "seq": 815,
+        },
+        "insights": {"insights": game.insights.insights(game.cells)},
+        "snapshot": {"type": "snapshot", "seq": 816, "game": game.to_dict()},
+    }
+    encoders = {"json": backend.default_encoder, **backend.WIRE_ENCODERS}
+    print(f"wire formats, {players}-player room ({', '.join(encoders)})")
+    for name, message in events.items():
+        cells = []
+        for encoder in encoders.values():
+            size = len(encoder(message))
+            elapsed = timed(lambda: encoder(message), repeat)
+            cells.append(f"{size:7d} B {elapsed * 1e6:8.1f} us")
+        print(f"  {name:<16}: " + " | ".join(cells))
+    backend.games.clear()
+
+
+def bench_compression(rooms=(50, 300, 1000), repeat: int = 20, frames: int = 500):
+    # CPU versus bytes: get_game bodies per codec and room size, then a stream of
+    # broadcast frames through permessage-deflate with and without context takeover
+    codecs = {f"gzip-{level}": (lambda body, level=level: backend.gzip.compress(body, level, mtime=0)) for level in (1, 6, 9)}
+    if backend.brotli:
+        codecs["br-4"] = lambda body: backend.brotli.compress(body, quality=4)
+    print(f"get_game body ({', '.join(codecs)})")
+    for players in rooms:
+        populate(1, players)
+        body = backend.default_encoder(next(iter(backend.games.values())).to_dict()).encode()
+        cells = []
+        for compress in codecs.values():
+            size = len(compress(body))
+            elapsed = timed(lambda: compress(body), repeat)
+            cells.append(f"{size / len(body):5.1%} {elapsed * 1e3:6.2f} ms")
+        print(f"  {players:5d} players, {len(body):8d} B: " + " | ".join(cells))
+    names = list(next(iter(backend.games.values())).players)
+    backend.games.clear()
+
+    rnd = random.Random(0)
+    stream = []
+    for i in range(frames):
+        name = rnd.choice(names)
+        stream.append(backend.default_encoder(rnd.choice([
+            {"type": "player_joined", "player_name": name, "player_count": i, "seq": i},
+            {"type": "player_ready", "player_name": name, "seq": i},
+            {"type": "player_finished", "player_name": name, "finish_time": time.time(), "position": i, "seq": i},
+        ])).encode())
+    raw = sum(len(frame) for frame in stream)
+
+    def deflate(takeover):
+        # What the server side of permessage-deflate does per frame (RFC 7692)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 5)
+        size = 0
+        for frame in stream:
+            if not takeover:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 5)
+            size += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+        return size
+
+    print(f"permessage-deflate, {frames} broadcast frames, {raw} B raw")
+    for label, takeover in (("context takeover", True), ("no context takeover", False)):
+        size = deflate(takeover)
+        elapsed = timed(lambda: deflate(takeover), 5)
+        print(f"  {label:<19}: {size / raw:5.1%} of raw, {elapsed / frames * 1e6:5.1f} us/frame")
+
+
+def bench_heartbeat(sizes=(500, 2000, 5000), misses: int = 2):
+    # One ping pass over real sockets, timed as heartbeat_forever runs it; then
+    # half the clients go on not reading, so their pongs never come, and get reaped
+    import uvicorn
+    from websockets.asyncio.client import connect
+
+    async def run(sockets):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        config = uvicorn.Config(backend.app, host="127.0.0.1", port=port, lifespan="off",
+                                log_level="warning", **backend.server_options())
+        server = uvicorn.Server(config)
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        clients = [await connect(f"ws://127.0.0.1:{port}/ws/G{i % 100}", ping_interval=None)
+                   for i in range(sockets)]
+        protocol = backend.BingoWebSocketProtocol
+        await asyncio.sleep(0.5)
+        # Clients share this loop; keep their pong handling out of the timed pass
+        for client in clients:
+            client.transport.pause_reading()
+        start = time.perf_counter()
+        await protocol.ping_all(misses)
+        elapsed = time.perf_counter() - start
+        for client in clients[1::2]:
+            client.transport.resume_reading()
+        reaped = 0
+        for _ in range(misses):
+            await asyncio.sleep(0.5)
+            reaped += await protocol.ping_all(misses)
+        open_after = sum(instance.open for instance in protocol.instances)
+        for client in clients[1::2]:
+            await client.close()
+        server.should_exit = True
+        await serving
+        return elapsed, reaped, open_after
+
+    print(f"protocol ping pass, one shared timer, reap after {misses} missed pongs")
+    for sockets in sizes:
+        elapsed, reaped, open_after = asyncio.run(run(sockets))
+        print(f"  {sockets:6d} sockets: {elapsed * 1e3:7.2f} ms per pass, "
+              f"{reaped} reaped, {open_after} still open")
+
+
+BENCHMARKS = {
+    "broadcast_encoding": bench_broadcast_encoding,
+    "disconnect_storm": bench_disconnect_storm,
+    "insights": bench_insights,
+    "player_memory": bench_player_memory,
+    "game_creation": bench_game_creation,
+    "snapshot": bench_snapshot,
+    "wal": bench_wal,
+    "store": bench_store,
+    "workers": bench_workers,
+    "player_cells": bench_player_cells,
+    "ws_commands": bench_ws_commands,
+    "mutation_responses": bench_mutation_responses,
+    "resume": bench_resume,
+    "join_rush": bench_join_rush,
+    "wire_formats": bench_wire_formats,
+    "compression": bench_compression,
+    "heartbeat": bench_heartbeat,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()